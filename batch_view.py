@@ -0,0 +1,334 @@
+import csv
+import json
+import os
+import threading
+import time
+
+import flet as ft
+from flet import (
+    Column, Container, DataCell, DataColumn, DataRow, DataTable, Divider, ElevatedButton,
+    Icon, IconButton, ProgressBar, Row, Text, TextField, TextStyle, ButtonStyle,
+    CrossAxisAlignment, MainAxisAlignment, RoundedRectangleBorder,
+    border, border_radius, icons, margin, padding,
+)
+
+from classifier import TEXT_COLUMNS, article_text
+
+# Batch tab: classify many pasted or uploaded articles at once
+
+DEFAULT_DELIMITER = "---"
+CHUNK_SIZE = 500  # Articles per vectorized classifier call; the progress bar moves per chunk
+PAGE_SIZE = 25  # Result rows rendered at a time
+# Web uploads, next to this module so ft.app and load_uploaded agree whatever the working directory
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
+
+
+def split_articles(text, delimiter=DEFAULT_DELIMITER):
+    # Articles are separated by a line containing only the delimiter (or by blank lines if empty)
+    if not delimiter:
+        chunks = text.split("\n\n")
+    else:
+        chunks, current = [], []
+        for line in text.splitlines():
+            if line.strip() == delimiter:
+                chunks.append("\n".join(current))
+                current = []
+            else:
+                current.append(line)
+        chunks.append("\n".join(current))
+    return [c.strip() for c in chunks if c.strip()]
+
+
+def read_articles_file(path, delimiter=DEFAULT_DELIMITER):
+    # .csv with text columns, .jsonl with one article per line, anything else as delimited text
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        if extension == ".csv":
+            reader = csv.DictReader(f)
+            if not set(reader.fieldnames or ()) & (set(TEXT_COLUMNS) | {"text"}):
+                raise ValueError(f"CSV needs a 'text' column or one of {', '.join(TEXT_COLUMNS)}")
+            return [t for t in (article_text(row).strip() for row in reader) if t]
+        if extension in (".jsonl", ".ndjson"):
+            articles = []
+            for line in f:
+                line = line.strip()
+                if line:
+                    record = json.loads(line)
+                    articles.append(article_text(record) if isinstance(record, dict) else str(record))
+            return [a for a in articles if a.strip()]
+        return split_articles(f.read(), delimiter)
+
+
+def build_batch_view(page, classifier, ui, category_colors, width):
+    articles = []
+    results = []
+    current_page = 0
+    is_running = False
+
+    delimiter_field = TextField(
+        value=DEFAULT_DELIMITER,
+        label="Delimiter",
+        width=120,
+        text_size=14,
+        border_color="#443770",
+        focused_border_color="#9a67ea",
+        bgcolor="#2a2640",
+        filled=True,
+        color="#e0e0f0",
+        label_style=TextStyle(color="#c8c8e0", font_family="Poppins-Medium"),
+    )
+
+    paste_field = TextField(
+        multiline=True,
+        min_lines=8,
+        max_lines=12,
+        hint_text=f"Paste articles here, separated by a line containing only {DEFAULT_DELIMITER}",
+        border_radius=8,
+        border_color="#443770",
+        focused_border_color="#9a67ea",
+        cursor_color="#9a67ea",
+        text_size=14,
+        bgcolor="#2a2640",
+        filled=True,
+        label="Articles",
+        color="#e0e0f0",
+        label_style=TextStyle(color="#c8c8e0", font_family="Poppins-Medium"),
+    )
+
+    status_text = Text("No articles loaded", size=13, color="#c8c8e0", font_family="Poppins")
+    progress_bar = ProgressBar(value=0, color="#9a67ea", bgcolor="#352f4d", visible=False)
+    summary_row = Row([], wrap=True, spacing=8)
+    page_text = Text("", size=13, color="#c8c8e0", font_family="Poppins")
+
+    results_table = DataTable(
+        columns=[
+            DataColumn(Text("#", color="#c8c8e0", font_family="Poppins-Medium"), numeric=True),
+            DataColumn(Text("Article", color="#c8c8e0", font_family="Poppins-Medium")),
+            DataColumn(Text("Category", color="#c8c8e0", font_family="Poppins-Medium")),
+            DataColumn(Text("Confidence", color="#c8c8e0", font_family="Poppins-Medium"), numeric=True),
+        ],
+        rows=[],
+        column_spacing=16,
+        heading_row_height=40,
+        data_row_min_height=36,
+        data_row_max_height=48,
+        divider_thickness=0.5,
+    )
+
+    def page_count():
+        return max(1, (len(results) + PAGE_SIZE - 1) // PAGE_SIZE)
+
+    def render_page():
+        # Only the rows of the visible page exist as controls, however many articles there are
+        start = current_page * PAGE_SIZE
+        rows = []
+        for i in range(start, min(start + PAGE_SIZE, len(results))):
+            result = results[i]
+            label = result["label"].lower()
+            preview = articles[i].replace("\n", " ")
+            rows.append(DataRow(cells=[
+                DataCell(Text(str(i + 1), color="#e0e0f0", size=13)),
+                DataCell(Text(preview[:80] + ("…" if len(preview) > 80 else ""), color="#e0e0f0", size=13,
+                              tooltip=preview[:500])),
+                DataCell(Row([
+                    Icon(category_colors.get(label, category_colors["default"])["icon"],
+                         color=category_colors.get(label, category_colors["default"])["color"], size=16),
+                    Text(label.capitalize(), color="#e0e0f0", size=13, font_family="Poppins-Medium"),
+                ], spacing=6)),
+                DataCell(Text(f"{int(result['confidence'] * 100)}%", color="#e0e0f0", size=13)),
+            ]))
+        ui.set(page_text, value=f"Page {current_page + 1} of {page_count()}" if results else "")
+        ui.set(prev_button, disabled=current_page == 0)
+        ui.set(next_button, disabled=current_page >= page_count() - 1)
+        # A fresh row list for the visible page; the table is the only large control updated
+        ui.set(results_table, rows=rows)
+
+    def go_to_page(delta):
+        nonlocal current_page
+        current_page = min(max(0, current_page + delta), page_count() - 1)
+        render_page()
+        ui.flush()
+
+    def render_summary():
+        counts = {}
+        for result in results:
+            counts[result["label"]] = counts.get(result["label"], 0) + 1
+        chips = []
+        for label, count in sorted(counts.items(), key=lambda item: -item[1]):
+            color = category_colors.get(label.lower(), category_colors["default"])["color"]
+            chips.append(Container(
+                content=Text(f"{label.capitalize()}: {count}", size=12, color="#e0e0f0", font_family="Poppins-Medium"),
+                bgcolor=ft.colors.with_opacity(0.25, color),
+                border=border.all(1, color),
+                border_radius=border_radius.all(10),
+                padding=padding.symmetric(horizontal=10, vertical=4),
+            ))
+        ui.set(summary_row, controls=chips)
+
+    def classify_worker(batch):
+        # Runs off the event handler thread so the UI keeps responding
+        nonlocal articles, results, current_page, is_running
+        start_time = time.time()
+        batch_results = []
+        try:
+            for offset in range(0, len(batch), CHUNK_SIZE):
+                batch_results.extend(classifier.classify(batch[offset:offset + CHUNK_SIZE]))
+                done = len(batch_results)
+                ui.set(progress_bar, value=done / len(batch))
+                ui.set(status_text, value=f"Classified {done} of {len(batch)} articles…")
+                ui.flush()
+        except Exception as exc:
+            ui.set(status_text, value=f"Classification failed: {exc}")
+            ui.set(progress_bar, visible=False)
+            ui.set(classify_button, disabled=False)
+            ui.flush()
+            is_running = False
+            return
+
+        articles, results = batch, batch_results
+        current_page = 0
+        elapsed = time.time() - start_time
+        ui.set(status_text, value=f"Classified {len(batch)} articles in {elapsed:.2f}s")
+        ui.set(progress_bar, visible=False)
+        ui.set(classify_button, disabled=False)
+        render_summary()
+        render_page()
+        ui.flush()
+        is_running = False
+
+    def start_classification(batch):
+        nonlocal is_running
+        if is_running:
+            return
+        if not batch:
+            ui.set(status_text, value="No articles found")
+            ui.flush()
+            return
+        is_running = True
+        ui.set(progress_bar, value=0, visible=True)
+        ui.set(classify_button, disabled=True)
+        ui.set(status_text, value=f"Classifying {len(batch)} articles…")
+        ui.flush()
+        threading.Thread(target=classify_worker, args=(batch,), daemon=True).start()
+
+    def classify_pasted(e):
+        start_classification(split_articles(paste_field.value or "", delimiter_field.value or ""))
+
+    def load_uploaded(path):
+        try:
+            batch = read_articles_file(path, delimiter_field.value or "")
+        except (OSError, ValueError) as exc:
+            ui.set(status_text, value=f"Could not read file: {exc}")
+            ui.flush()
+            return
+        start_classification(batch)
+
+    def on_pick_result(e):
+        if not e.files:
+            return
+        picked = e.files[0]
+        if picked.path:
+            # Desktop app: read the file in place
+            load_uploaded(picked.path)
+            return
+        # Web clients upload the file to the server first
+        ui.set(status_text, value=f"Uploading {picked.name}…")
+        ui.flush()
+        file_picker.upload([
+            ft.FilePickerUploadFile(picked.name, upload_url=page.get_upload_url(picked.name, 600)),
+        ])
+
+    def on_upload(e):
+        if e.error:
+            ui.set(status_text, value=f"Upload failed: {e.error}")
+            ui.flush()
+        elif e.progress is not None and e.progress >= 1.0:
+            load_uploaded(os.path.join(UPLOAD_DIR, e.file_name))
+
+    file_picker = ft.FilePicker(on_result=on_pick_result, on_upload=on_upload)
+    page.overlay.append(file_picker)
+
+    upload_button = ElevatedButton(
+        content=Row(
+            [
+                Icon(icons.UPLOAD_FILE_ROUNDED, color="#e0e0f0", size=18),
+                Text("Upload File", size=14, color="#e0e0f0", font_family="Poppins-Medium"),
+            ],
+            spacing=8,
+        ),
+        style=ButtonStyle(
+            shape=RoundedRectangleBorder(radius=12),
+            bgcolor="#554986",
+            elevation=0,
+            padding=15,
+        ),
+        on_click=lambda e: file_picker.pick_files(
+            dialog_title="Choose articles",
+            allowed_extensions=["txt", "csv", "jsonl", "ndjson"],
+        ),
+        tooltip="Upload .txt (delimited), .csv or .jsonl",
+        expand=True,
+    )
+
+    classify_button = ElevatedButton(
+        content=Row(
+            [
+                Icon(icons.ANALYTICS_ROUNDED, color="#e0e0f0", size=18),
+                Text("Classify All", size=14, color="#e0e0f0", font_family="Poppins-Medium"),
+            ],
+            spacing=8,
+        ),
+        style=ButtonStyle(
+            shape=RoundedRectangleBorder(radius=12),
+            bgcolor={"": "#9a67ea", "hovered": "#8252c8"},
+            color={"": "#e0e0f0", "hovered": "#e0e0f0"},
+            elevation={"": 0, "hovered": 2},
+            padding=15,
+        ),
+        on_click=classify_pasted,
+        tooltip="Classify the pasted articles",
+        expand=True,
+    )
+
+    prev_button = IconButton(icons.CHEVRON_LEFT_ROUNDED, icon_color="#e0e0f0", disabled=True,
+                             on_click=lambda e: go_to_page(-1), tooltip="Previous page")
+    next_button = IconButton(icons.CHEVRON_RIGHT_ROUNDED, icon_color="#e0e0f0", disabled=True,
+                             on_click=lambda e: go_to_page(1), tooltip="Next page")
+
+    return Container(
+        content=Column(
+            [
+                Row(
+                    [
+                        Icon(icons.LIBRARY_BOOKS_ROUNDED, color="#9a67ea", size=24),
+                        Text("Batch Classification", size=18, weight="bold", color="#e0e0f0",
+                             font_family="Poppins-Bold"),
+                    ],
+                    spacing=10,
+                ),
+                Divider(height=1, color="#352f4d", thickness=2),
+                Container(height=10),
+                paste_field,
+                Row([delimiter_field, upload_button, classify_button], spacing=10,
+                    vertical_alignment=CrossAxisAlignment.CENTER),
+                progress_bar,
+                status_text,
+                summary_row,
+                Container(
+                    content=Column([results_table], scroll=ft.ScrollMode.AUTO),
+                    border=border.all(1, "#352f4d"),
+                    border_radius=border_radius.all(12),
+                    margin=margin.only(top=10),
+                ),
+                Row([prev_button, page_text, next_button], alignment=MainAxisAlignment.CENTER),
+            ],
+            spacing=10,
+        ),
+        bgcolor="#2a2640",
+        padding=padding.all(20),
+        border_radius=border_radius.all(16),
+        border=border.all(1, "#352f4d"),
+        width=width,
+        margin=margin.only(bottom=20),
+        visible=False,
+    )
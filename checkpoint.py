@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from classifier import TEXT_COLUMNS, add_model_arguments, load_classifier
+from columnar import ColumnarWriter, classify_batch, iter_record_batches, output_schema_for, row_group_sizes
+from model_bundle import read_manifest
+
+# Options that change the output; anything else (e.g. batch size) may differ between restarts.
+# The model is identified by its contents (see _model_identity), not by these paths.
+JOB_OPTIONS = ("text_columns", "id_column", "top_k", "min_probability")
+
+# Resumable bulk classification over Parquet / Arrow IPC input.
+#
+# Output is a directory with one shard per input row group (part-00012.parquet holds
+# the predictions for row group 12). Shards are written to a temporary file, fsynced
+# and renamed into place (the directory is fsynced too), then the worker's checkpoint
+# file records the row group as committed along with the shard's size. A restart skips
+# committed row groups whose shard is present at that size; a crash between the rename
+# and the checkpoint update just rewrites the same shard, so output is idempotent.
+# Each worker owns a contiguous range of row groups and its own checkpoint file.
+
+
+def split_ranges(num_row_groups, num_workers):
+    # Contiguous [start, stop) row-group ranges, as even as possible
+    num_workers = max(1, min(num_workers, num_row_groups))
+    base, extra = divmod(num_row_groups, num_workers)
+    ranges = []
+    start = 0
+    for i in range(num_workers):
+        stop = start + base + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _fsync(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _durable_replace(tmp_path, path):
+    # Rename, then fsync the directory so the rename itself survives a host crash
+    # (Windows cannot open a directory for fsync and does not need it)
+    os.replace(tmp_path, path)
+    if os.name != "nt":
+        _fsync(os.path.dirname(os.path.abspath(path)))
+
+
+def _atomic_write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    _durable_replace(tmp_path, path)
+
+
+class Checkpoint:
+    # Committed row groups and output shards for one worker's range
+
+    def __init__(self, path, job, row_range):
+        self.path = path
+        self.job = job
+        self.row_range = list(row_range)
+        self.completed = {}  # row group -> {"shard": file name, "bytes": size}
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state["job"] != job or state["range"] != self.row_range:
+                raise ValueError(
+                    f"Checkpoint {path} belongs to a different job or range; "
+                    "use a fresh output directory or delete the checkpoint"
+                )
+            self.completed = {int(k): v for k, v in state["completed"].items()}
+
+    def is_committed(self, row_group, output_dir):
+        # A missing shard, or one of another size (truncated, rewritten), is redone
+        entry = self.completed.get(row_group)
+        if entry is None:
+            return False
+        try:
+            return os.path.getsize(os.path.join(output_dir, entry["shard"])) == entry["bytes"]
+        except OSError:
+            return False
+
+    def commit(self, row_group, shard, size):
+        self.completed[row_group] = {"shard": shard, "bytes": size}
+        _atomic_write_json(self.path, {
+            "job": self.job,
+            "range": self.row_range,
+            "completed": {str(k): v for k, v in sorted(self.completed.items())},
+            "updated_at": time.time(),
+        })
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _model_identity(options):
+    # The model's content, not its path: a bundle rebuilt in place is a different job
+    if options["vectorizer"] is not None or options["model"] is not None:
+        return {"vectorizer_sha256": _file_sha256(options["vectorizer"]),
+                "model_sha256": _file_sha256(options["model"])}
+    return {"payload_sha256": read_manifest(options["bundle"])["payload_sha256"]}
+
+
+def _job_description(input_path, sizes, options):
+    # Identifies the job so a checkpoint is never reused for different input, model or settings
+    stat = os.stat(input_path)
+    return {
+        "input": os.path.abspath(input_path),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "model": _model_identity(options),
+        "row_groups": len(sizes),
+        "rows": sum(sizes),
+        "options": {k: options[k] for k in JOB_OPTIONS},
+    }
+
+
+def run_worker(input_path, output_dir, row_range, options, shard_extension=".parquet"):
+    # Classify row groups [start, stop) of input_path, skipping those already committed
+    sizes = row_group_sizes(input_path)
+    job = _job_description(input_path, sizes, options)
+    start, stop = row_range
+    checkpoint = Checkpoint(os.path.join(output_dir, f"_checkpoint-{start:05d}-{stop:05d}.json"), job, row_range)
+
+    pending = [rg for rg in range(start, stop) if not checkpoint.is_committed(rg, output_dir)]
+    if not pending:
+        return 0
+
+    classifier = load_classifier(options["bundle"], options["vectorizer"], options["model"],
+                                 expected_sha256=options["bundle_sha256"])
+    text_columns = options["text_columns"]
+    id_column = options["id_column"]
+    columns = list(text_columns) + ([id_column] if id_column else [])
+    row_offsets = [0]
+    for size in sizes:
+        row_offsets.append(row_offsets[-1] + size)
+
+    schema = output_schema_for(classifier, input_path, id_column, options["top_k"], options["min_probability"])
+    classified = 0
+    for row_group in pending:
+        shard = f"part-{row_group:05d}{shard_extension}"
+        # Temporary name keeps the extension so the writer picks the same format. The writer
+        # is opened with the schema up front, so an empty row group still gets its (empty) shard.
+        tmp_path = os.path.join(output_dir, f".tmp-{shard}")
+        writer = ColumnarWriter(tmp_path, schema)
+        rows_in_group = 0
+        try:
+            for _, batch in iter_record_batches(input_path, columns, batch_size=options["batch_size"],
+                                                row_groups=[row_group]):
+                writer.write_batch(classify_batch(
+                    classifier, batch, row_offsets[row_group] + rows_in_group,
+                    text_columns=text_columns, id_column=id_column,
+                    top_k=options["top_k"], min_probability=options["min_probability"],
+                ))
+                rows_in_group += batch.num_rows
+        finally:
+            writer.close()
+        # The shard's data must be on disk before the checkpoint says it is done
+        _fsync(tmp_path)
+        _durable_replace(tmp_path, os.path.join(output_dir, shard))
+        checkpoint.commit(row_group, shard, os.path.getsize(os.path.join(output_dir, shard)))
+        classified += rows_in_group
+
+    return classified
+
+
+def run(input_path, output_dir, num_workers=1, worker_index=None, shard_extension=".parquet", **options):
+    # Runs every worker range locally, or only worker_index when workers run on separate hosts
+    os.makedirs(output_dir, exist_ok=True)
+    ranges = split_ranges(len(row_group_sizes(input_path)), num_workers)
+    if worker_index is not None:
+        ranges = [ranges[worker_index]]
+
+    if len(ranges) == 1:
+        return run_worker(input_path, output_dir, ranges[0], options, shard_extension)
+
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [
+            executor.submit(run_worker, input_path, output_dir, row_range, options, shard_extension)
+            for row_range in ranges
+        ]
+        return sum(f.result() for f in futures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable, checkpointed bulk classification of Parquet / Arrow files.")
+    parser.add_argument("input", help="Input .parquet or .arrow/.feather file")
+    parser.add_argument("output_dir", help="Directory for output shards and checkpoints")
+    add_model_arguments(parser)
+    parser.add_argument("--batch-size", type=int, default=8192)
+    parser.add_argument("--text-columns", nargs="+", default=list(TEXT_COLUMNS))
+    parser.add_argument("--id-column", default=None)
+    parser.add_argument("--top-k", type=int, default=None)
+    parser.add_argument("--min-probability", type=float, default=None)
+    parser.add_argument("--workers", type=int, default=1, help="Number of row-group ranges / worker processes")
+    parser.add_argument("--worker-index", type=int, default=None,
+                        help="Only run this worker's range (for spreading workers across hosts)")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet", help="Output shard format")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    rows = run(
+        args.input, args.output_dir,
+        num_workers=args.workers,
+        worker_index=args.worker_index,
+        shard_extension=f".{args.format}",
+        bundle=args.bundle,
+        vectorizer=args.vectorizer,
+        model=args.model,
+        bundle_sha256=args.bundle_sha256,
+        batch_size=args.batch_size,
+        text_columns=args.text_columns,
+        id_column=args.id_column,
+        top_k=args.top_k,
+        min_probability=args.min_probability,
+    )
+    elapsed = time.time() - start_time
+    print(f"Classified {rows} articles in {elapsed:.2f}s (already committed row groups skipped)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
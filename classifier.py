@@ -0,0 +1,338 @@
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from explain import ContributionTable
+from model_bundle import DEFAULT_BUNDLE_PATH, check_compatible, load_bundle
+from near_duplicates import FINGERPRINT_BITS, NearDuplicateIndex, hamming_distance
+
+# Columns combined into the model input, in the same order as the training notebook
+TEXT_COLUMNS = ("headlines", "description", "content")
+
+
+def softmax(scores, temperature=1.0):
+    # Softmax over the last axis (one score vector or a matrix of rows), optionally softened
+    scores = np.asarray(scores, dtype=np.float64)
+    if temperature != 1.0:
+        scores = scores / temperature
+    scores = scores - scores.max(axis=-1, keepdims=True)
+    np.exp(scores, out=scores)
+    scores /= scores.sum(axis=-1, keepdims=True)
+    return scores
+
+
+def article_text(record):
+    # Model input for a record: an explicit "text" field, else the joined text columns
+    if record.get("text") is not None:
+        return str(record["text"])
+    return " ".join(str(record[c]) for c in TEXT_COLUMNS if record.get(c) is not None)
+
+
+def top_k_indices(scores, k):
+    # Column indices of the k largest scores per row, highest first.
+    # argpartition keeps this O(n_classes) per row instead of a full sort.
+    n_classes = scores.shape[1]
+    if k >= n_classes:
+        return np.argsort(-scores, axis=1)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+class BaseClassifier:
+    # Shared classification API: result dicts, compact top-k output and the optional
+    # NearDuplicateIndex in front of the model (near-identical articles reuse the stored
+    # result instead of being scored). Backends implement score() and _score_batch().
+    # An optional ClassifierMonitor records every classified batch, and stage latencies
+    # keyed by backend name (e.g. "score.linear").
+
+    name = "model"
+
+    def __init__(self, classes, dedup_index=None, monitor=None):
+        self.classes = [str(c) for c in classes]
+        self.dedup_index = dedup_index
+        self.monitor = monitor
+        # The dedup index is shared state; guard it when classify runs on worker threads
+        self._dedup_lock = threading.Lock()
+
+    def explains(self):
+        return False
+
+    def score(self, texts):
+        # Probability matrix of shape (len(texts), len(self.classes))
+        raise NotImplementedError
+
+    def _prepare(self, texts):
+        # Per-text model input shared by fingerprinting and scoring (row-indexable), or None
+        return None
+
+    def _fingerprints(self, texts, prepared):
+        return [self.dedup_index.fingerprint(text) for text in texts]
+
+    def _score_batch(self, texts, prepared, explain_top_n=None):
+        # (probabilities, explanations or None) for the texts that have to be scored
+        return self.score(texts), None
+
+    def _deduplicate(self, texts, prepared, explain_top_n, results):
+        # Fills results[i] for articles matching the index and returns (leaders, followers,
+        # fingerprints): the rows to score, and row -> leader row for near-copies later in
+        # the same batch
+        fingerprints = self._fingerprints(texts, prepared)
+        batch_index = NearDuplicateIndex(self.dedup_index.similarity_threshold, max_entries=max(1, len(texts)))
+        leaders, followers = [], {}
+        for i, fingerprint in enumerate(fingerprints):
+            with self._dedup_lock:
+                match = self.dedup_index.lookup(fingerprint=fingerprint)
+            # A stored result without an explanation is rescored when one is asked for
+            if match is not None and (explain_top_n is None or "explanation" in match[0]):
+                stored, similarity = match
+                results[i] = dict(stored, duplicate_of_similarity=similarity)
+                continue
+            match = batch_index.lookup(fingerprint=fingerprint)
+            if match is not None:
+                followers[i] = match[0]
+            else:
+                batch_index.add(i, fingerprint=fingerprint)
+                leaders.append(i)
+        return leaders, followers, fingerprints
+
+    def _make_result(self, probabilities):
+        best = int(np.argmax(probabilities))
+        return {
+            "label": self.classes[best],
+            "confidence": float(probabilities[best]),
+            "probabilities": probabilities,
+            "duplicate_of_similarity": None,
+        }
+
+    def _compact(self, results, top_k, min_probability):
+        # Replace dense probability rows with a short list of (label, probability)
+        probabilities = np.vstack([r["probabilities"] for r in results])
+        k = top_k if top_k is not None else len(self.classes)
+        indices = top_k_indices(probabilities, k)
+        values = np.take_along_axis(probabilities, indices, axis=1)
+
+        compact = []
+        for result, row_indices, row_values in zip(results, indices, values):
+            if min_probability is not None:
+                keep = row_values >= min_probability
+                row_indices, row_values = row_indices[keep], row_values[keep]
+            top = [(self.classes[i], float(p)) for i, p in zip(row_indices, row_values)]
+            entry = {
+                "label": result["label"],
+                "confidence": result["confidence"],
+                "top": top,
+                "duplicate_of_similarity": result["duplicate_of_similarity"],
+            }
+            if "explanation" in result:
+                entry["explanation"] = result["explanation"]
+            compact.append(entry)
+        return compact
+
+    def classify(self, texts, top_k=None, min_probability=None, explain_top_n=None, observe=True):
+        # Returns one result dict per text, in input order.
+        # With top_k and/or min_probability set, each result carries a compact "top"
+        # list of (label, probability) pairs instead of the full "probabilities" row.
+        # With explain_top_n set, each result also carries an "explanation" list of the
+        # (term, contribution) pairs that pushed hardest towards the predicted label.
+        # observe=False leaves the articles out of the monitor (a router observes once instead).
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be at least 1")
+        if explain_top_n is not None and explain_top_n < 0:
+            raise ValueError("explain_top_n must be at least 0")
+        if explain_top_n is not None and not self.explains():
+            raise ValueError(f"{type(self).__name__} cannot explain predictions with this model")
+
+        if not texts:
+            return []
+        results = [None] * len(texts)
+        start_time = time.perf_counter()
+        prepared = self._prepare(texts)
+
+        if self.dedup_index is not None:
+            pending, followers, fingerprints = self._deduplicate(texts, prepared, explain_top_n, results)
+        else:
+            pending, followers, fingerprints = list(range(len(texts))), {}, None
+
+        if pending:
+            score_start = time.perf_counter()
+            all_rows = len(pending) == len(texts)
+            probabilities, explanations = self._score_batch(
+                texts if all_rows else [texts[i] for i in pending],
+                prepared if all_rows or prepared is None else prepared[pending],
+                explain_top_n,
+            )
+            if self.monitor is not None:
+                self.monitor.record_latency(f"score.{self.name}", time.perf_counter() - score_start)
+            for row, i in enumerate(pending):
+                results[i] = self._make_result(probabilities[row])
+                if explanations is not None:
+                    results[i]["explanation"] = explanations[row]
+                if fingerprints is not None:
+                    with self._dedup_lock:
+                        self.dedup_index.add(results[i], fingerprint=fingerprints[i])
+
+        for i, leader in followers.items():
+            similarity = 1.0 - hamming_distance(fingerprints[i], fingerprints[leader]) / FINGERPRINT_BITS
+            results[i] = dict(results[leader], duplicate_of_similarity=similarity)
+
+        if self.monitor is not None:
+            self.monitor.record_latency(f"classify.{self.name}", time.perf_counter() - start_time)
+            if observe:
+                self.monitor.observe(texts, results)
+        if results and (top_k is not None or min_probability is not None):
+            return self._compact(results, top_k, min_probability)
+        return results
+
+    def classify_one(self, text, top_k=None, min_probability=None, explain_top_n=None):
+        return self.classify([text], top_k=top_k, min_probability=min_probability,
+                             explain_top_n=explain_top_n)[0]
+
+
+class NewsClassifier(BaseClassifier):
+    # Classification engine wrapping a fitted TF-IDF vectorizer and linear model
+
+    name = "linear"
+
+    def __init__(self, vectorizer, model, dedup_index=None, manifest=None, monitor=None):
+        # Reject a vectorizer/model pair that was not trained together before it is ever used
+        check_compatible(vectorizer, model)
+        super().__init__(model.classes_, dedup_index=dedup_index, monitor=monitor)
+        self.manifest = manifest
+        self.vectorizer = vectorizer
+        self.model = model
+        # Token -> per-class contributions, so explanations come from the same pass as scoring
+        self.contributions = ContributionTable(vectorizer, model) if hasattr(model, "coef_") else None
+
+    def explains(self):
+        return self.contributions is not None
+
+    def score(self, texts):
+        return self._score_features(self.vectorizer.transform(texts))
+
+    def _prepare(self, texts):
+        return self.vectorizer.transform(texts)
+
+    def _fingerprints(self, texts, features):
+        # Fingerprints of the TF-IDF rows already computed for scoring
+        return self.dedup_index.fingerprint_features(features)
+
+    def _score_features(self, features):
+        if hasattr(self.model, "predict_proba"):
+            return self.model.predict_proba(features)
+
+        # Models without predict_proba (e.g. LinearSVC) get a softmax over decision scores
+        scores = np.asarray(self.model.decision_function(features), dtype=np.float64)
+        if scores.ndim == 1:
+            scores = np.column_stack([-scores, scores])
+        return softmax(scores)
+
+    def _score_batch(self, texts, features, explain_top_n=None):
+        probabilities = self._score_features(features)
+        explanations = None
+        if explain_top_n is not None:
+            explanations = self.contributions.explain_features(
+                features, probabilities.argmax(axis=1), top_n=explain_top_n
+            )
+        return probabilities, explanations
+
+
+class ClassifierRouter:
+    # Picks a backend per request: backend="linear", "transformer", ... or "auto", which
+    # scores everything with the primary backend (the first one given) and re-scores only
+    # the articles whose confidence is below uncertainty_threshold with the fallback.
+    # All backends must predict the primary's labels; probability rows are returned in
+    # the primary's class order whichever backend produced them. A backend that cannot
+    # explain its predictions returns results without "explanation". With a monitor, each
+    # routed article is observed once, with the label it was finally given.
+
+    def __init__(self, backends, default=None, fallback=None, uncertainty_threshold=0.6, monitor=None):
+        self.backends = dict(backends)
+        self.monitor = monitor
+        self.primary = next(iter(self.backends))
+        self.default = default or self.primary
+        self.fallback = fallback
+        self.uncertainty_threshold = uncertainty_threshold
+        for name in (self.default, fallback):
+            if name is not None and name != "auto" and name not in self.backends:
+                raise ValueError(f"Unknown backend {name!r}; available: {', '.join(self.backends)}")
+        if self.default == "auto" and fallback is None:
+            raise ValueError("backend 'auto' needs a fallback backend")
+
+        self.classes = self.backends[self.primary].classes
+        self._orders = {}  # backend -> column order that maps its probabilities onto self.classes
+        for name, backend in self.backends.items():
+            if len(backend.classes) != len(self.classes) or set(backend.classes) != set(self.classes):
+                raise ValueError(
+                    f"Backend {name!r} predicts {sorted(backend.classes)} but {self.primary!r} predicts "
+                    f"{sorted(self.classes)}; map the labels onto the same classes (e.g. --transformer-label-map)"
+                )
+            if backend.classes != self.classes:
+                index = {c: i for i, c in enumerate(backend.classes)}
+                self._orders[name] = np.array([index[c] for c in self.classes])
+
+    def _run(self, name, texts, options):
+        backend = self.backends[name]
+        if not backend.explains() and options.get("explain_top_n") is not None:
+            options = dict(options, explain_top_n=None)
+        results = backend.classify(texts, observe=False, **options)
+        order = self._orders.get(name)
+        if order is None:
+            return results
+        return [dict(r, probabilities=r["probabilities"][order]) if "probabilities" in r else r for r in results]
+
+    def classify(self, texts, backend=None, **options):
+        backend = backend or self.default
+        if backend != "auto" and backend not in self.backends:
+            raise ValueError(f"Unknown backend {backend!r}; available: {', '.join(self.backends)}, auto")
+        start_time = time.perf_counter()
+        results = self._route(texts, backend, options)
+        if self.monitor is not None and results:
+            self.monitor.record_latency("classify", time.perf_counter() - start_time)
+            self.monitor.observe(texts, results)
+        return results
+
+    def _route(self, texts, backend, options):
+        if backend != "auto":
+            return self._run(backend, texts, options)
+
+        results = self._run(self.primary, texts, options)
+        if self.fallback is None:
+            return results
+        uncertain = [i for i, r in enumerate(results) if r["confidence"] < self.uncertainty_threshold]
+        if uncertain:
+            rescored = self._run(self.fallback, [texts[i] for i in uncertain], options)
+            for i, result in zip(uncertain, rescored):
+                results[i] = dict(result, backend=self.fallback)
+        return results
+
+    def classify_one(self, text, backend=None, **options):
+        return self.classify([text], backend=backend, **options)[0]
+
+
+def load_classifier(bundle_path=DEFAULT_BUNDLE_PATH, vectorizer_path=None, model_path=None, dedup_index=None,
+                    monitor=None, expected_sha256=None):
+    # Loads from a validated model bundle, or from a loose vectorizer/model pair when both paths are given.
+    # expected_sha256 pins the bundle file; it is checked before anything is unpickled.
+    if vectorizer_path is not None or model_path is not None:
+        if vectorizer_path is None or model_path is None:
+            raise ValueError("vectorizer_path and model_path must be given together")
+        return NewsClassifier(joblib.load(vectorizer_path), joblib.load(model_path), dedup_index=dedup_index,
+                              monitor=monitor)
+
+    vectorizer, model, manifest = load_bundle(bundle_path, expected_sha256=expected_sha256)
+    return NewsClassifier(vectorizer, model, dedup_index=dedup_index, manifest=manifest, monitor=monitor)
+
+
+def add_model_arguments(parser):
+    parser.add_argument("--bundle", default=DEFAULT_BUNDLE_PATH, help="Model bundle (see model_bundle.py)")
+    parser.add_argument("--vectorizer", default=None, help="Loose vectorizer .pkl (use with --model instead of --bundle)")
+    parser.add_argument("--model", default=None, help="Loose model .pkl (use with --vectorizer instead of --bundle)")
+    parser.add_argument("--bundle-sha256", default=None, help="Refuse to load a bundle whose sha256 differs")
+
+
+def classifier_from_args(args, dedup_index=None, monitor=None):
+    return load_classifier(args.bundle, args.vectorizer, args.model, dedup_index=dedup_index, monitor=monitor,
+                           expected_sha256=args.bundle_sha256)
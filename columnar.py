@@ -0,0 +1,224 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from classifier import TEXT_COLUMNS, add_model_arguments, classifier_from_args, top_k_indices
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Columnar input/output requires pyarrow: pip install pyarrow")
+
+
+def _is_arrow_file(path):
+    return os.path.splitext(path)[1].lower() in ARROW_EXTENSIONS
+
+
+def _text_column(batch, text_columns):
+    # Join the text columns with a space, like the training notebook, entirely in Arrow
+    present = [c for c in text_columns if c in batch.schema.names]
+    if not present:
+        raise ValueError(f"None of the text columns {list(text_columns)} are present in the input")
+    columns = [pc.cast(batch.column(c), pa.string()) for c in present]
+    if len(columns) == 1:
+        return pc.fill_null(columns[0], "")
+    return pc.binary_join_element_wise(*columns, " ", null_handling="replace", null_replacement="")
+
+
+def iter_record_batches(path, columns, batch_size=8192, row_groups=None):
+    # Yields (row_group, RecordBatch) reading only the requested columns.
+    # Parquet is read one row group at a time; Arrow IPC files one stored batch at a time.
+    # row_groups restricts the read to those groups (all of them by default).
+    _require_pyarrow()
+    if _is_arrow_file(path):
+        reader = ipc.open_file(pa.memory_map(path, "r"))
+        wanted = [c for c in columns if c in reader.schema.names]
+        for i in (range(reader.num_record_batches) if row_groups is None else row_groups):
+            batch = reader.get_batch(i).select(wanted)
+            for offset in range(0, batch.num_rows, batch_size):
+                yield i, batch.slice(offset, batch_size)
+        return
+
+    parquet_file = pq.ParquetFile(path)
+    wanted = [c for c in columns if c in parquet_file.schema_arrow.names]
+    for i in (range(parquet_file.num_row_groups) if row_groups is None else row_groups):
+        table = parquet_file.read_row_group(i, columns=wanted)
+        for batch in table.to_batches(max_chunksize=batch_size):
+            yield i, batch
+
+
+def row_group_sizes(path):
+    # Row count of every row group (Parquet) or stored record batch (Arrow IPC)
+    _require_pyarrow()
+    if _is_arrow_file(path):
+        reader = ipc.open_file(pa.memory_map(path, "r"))
+        return [reader.get_batch(i).num_rows for i in range(reader.num_record_batches)]
+    metadata = pq.ParquetFile(path).metadata
+    return [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+
+
+def input_schema(path):
+    _require_pyarrow()
+    if _is_arrow_file(path):
+        return ipc.open_file(pa.memory_map(path, "r")).schema
+    return pq.ParquetFile(path).schema_arrow
+
+
+def predictions_to_batch(classes, probabilities, row_offset, ids=None, top_k=None, min_probability=None):
+    # Typed output columns built straight from the probability matrix, no per-row objects
+    n_rows = probabilities.shape[0]
+    best = probabilities.argmax(axis=1)
+    dictionary = pa.array(classes, type=pa.string())
+
+    names = ["row"]
+    arrays = [pa.array(np.arange(row_offset, row_offset + n_rows, dtype=np.int64))]
+    if ids is not None:
+        names.append("id")
+        arrays.append(ids)
+
+    names += ["label", "confidence"]
+    arrays += [
+        pa.DictionaryArray.from_arrays(pa.array(best.astype(np.int32)), dictionary),
+        pa.array(probabilities[np.arange(n_rows), best].astype(np.float32)),
+    ]
+
+    if top_k is None and min_probability is None:
+        # One float32 column per class
+        for i, name in enumerate(classes):
+            names.append(f"prob_{name}")
+            arrays.append(pa.array(probabilities[:, i].astype(np.float32)))
+        return pa.RecordBatch.from_arrays(arrays, names=names)
+
+    k = top_k if top_k is not None else len(classes)
+    indices = top_k_indices(probabilities, k)
+    values = np.take_along_axis(probabilities, indices, axis=1).astype(np.float32)
+    if min_probability is None:
+        keep = np.ones(values.shape, dtype=bool)
+    else:
+        keep = values >= min_probability
+    offsets = pa.array(np.concatenate([[0], np.cumsum(keep.sum(axis=1))]).astype(np.int32))
+    top_labels = pa.DictionaryArray.from_arrays(pa.array(indices[keep].astype(np.int32)), dictionary)
+
+    names += ["top_labels", "top_probabilities"]
+    arrays += [
+        pa.ListArray.from_arrays(offsets, top_labels),
+        pa.ListArray.from_arrays(offsets, pa.array(values[keep])),
+    ]
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def output_schema(classes, id_type=None, top_k=None, min_probability=None):
+    # Schema of predictions_to_batch's output, known before any rows are classified
+    ids = pa.array([], type=id_type) if id_type is not None else None
+    empty = np.zeros((0, len(classes)), dtype=np.float64)
+    return predictions_to_batch(classes, empty, 0, ids=ids, top_k=top_k, min_probability=min_probability).schema
+
+
+def output_schema_for(classifier, input_path, id_column=None, top_k=None, min_probability=None):
+    id_type = None
+    if id_column:
+        schema = input_schema(input_path)
+        if id_column not in schema.names:
+            raise ValueError(f"Id column {id_column!r} is not in {input_path}")
+        id_type = schema.field(id_column).type
+    return output_schema(classifier.classes, id_type, top_k=top_k, min_probability=min_probability)
+
+
+class ColumnarWriter:
+    # Parquet or Arrow IPC writer chosen from the file extension. Given a schema the file is
+    # created up front, so input without rows still produces a valid, typed (empty) output;
+    # otherwise the schema comes from the first batch.
+
+    def __init__(self, path, schema=None):
+        _require_pyarrow()
+        self.path = path
+        self._writer = None
+        self._sink = None
+        if schema is not None:
+            self._open(schema)
+
+    def _open(self, schema):
+        if _is_arrow_file(self.path):
+            self._sink = pa.OSFile(self.path, "wb")
+            self._writer = ipc.new_file(self._sink, schema)
+        else:
+            self._writer = pq.ParquetWriter(self.path, schema, compression="zstd")
+
+    def write_batch(self, batch):
+        if self._writer is None:
+            self._open(batch.schema)
+        if _is_arrow_file(self.path):
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write_batch(batch, row_group_size=batch.num_rows)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+
+def classify_batch(classifier, batch, row_offset, text_columns=TEXT_COLUMNS, id_column=None,
+                   top_k=None, min_probability=None):
+    # The vectorizer needs Python strings, so this is the only place rows leave Arrow
+    texts = _text_column(batch, text_columns).to_pylist()
+    probabilities = classifier.score(texts)
+    ids = batch.column(id_column) if id_column else None
+    return predictions_to_batch(classifier.classes, probabilities, row_offset, ids=ids,
+                                top_k=top_k, min_probability=min_probability)
+
+
+def classify_file(classifier, input_path, output_path, batch_size=8192, text_columns=TEXT_COLUMNS,
+                  id_column=None, top_k=None, min_probability=None):
+    columns = list(text_columns) + ([id_column] if id_column else [])
+    writer = ColumnarWriter(output_path, output_schema_for(classifier, input_path, id_column, top_k, min_probability))
+    rows = 0
+    try:
+        for _, batch in iter_record_batches(input_path, columns, batch_size=batch_size):
+            writer.write_batch(classify_batch(classifier, batch, rows, text_columns=text_columns,
+                                              id_column=id_column, top_k=top_k,
+                                              min_probability=min_probability))
+            rows += batch.num_rows
+    finally:
+        writer.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify news articles stored as Parquet or Arrow IPC.")
+    parser.add_argument("input", help="Input .parquet or .arrow/.feather file")
+    parser.add_argument("output", help="Output .parquet or .arrow/.feather file")
+    add_model_arguments(parser)
+    parser.add_argument("--batch-size", type=int, default=8192)
+    parser.add_argument("--text-columns", nargs="+", default=list(TEXT_COLUMNS))
+    parser.add_argument("--id-column", default=None, help="Input column copied to the output as 'id'")
+    parser.add_argument("--top-k", type=int, default=None)
+    parser.add_argument("--min-probability", type=float, default=None)
+    args = parser.parse_args()
+
+    classifier = classifier_from_args(args)
+    start_time = time.time()
+    rows = classify_file(classifier, args.input, args.output, batch_size=args.batch_size,
+                         text_columns=args.text_columns, id_column=args.id_column,
+                         top_k=args.top_k, min_probability=args.min_probability)
+    elapsed = time.time() - start_time
+    print(f"Classified {rows} articles in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):.1f} articles/s)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
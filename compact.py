@@ -0,0 +1,199 @@
+import argparse
+import copy
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+
+from classifier import NewsClassifier
+from distill import load_corpus
+from model_bundle import DEFAULT_BUNDLE_PATH, idf_weights, load_bundle, save_bundle
+
+# Post-training compaction: drop vocabulary entries that barely move any class score,
+# from the vectorizer and the model together, and re-export them as one bundle.
+#
+# A term's largest possible pull on the decision is max_c |W_cj| * idf_j (its TF-IDF
+# value is idf_j times a normalized count). "magnitude" keeps the terms with the highest
+# such weight; "l1" fits an L1-penalized logistic regression and keeps the terms it
+# leaves nonzero for any class. Dropped terms no longer count towards the l2 norm, so
+# the surviving feature values shift slightly; refitting the model on the compacted
+# vocabulary (always done for "l1", optional for "magnitude") absorbs that.
+
+
+def feature_importance(vectorizer, model):
+    return np.abs(np.asarray(model.coef_, dtype=np.float64)).max(axis=0) * idf_weights(vectorizer)
+
+
+def select_by_magnitude(vectorizer, model, keep=None, threshold=None):
+    # Indices of the kept features, in vocabulary order
+    importance = feature_importance(vectorizer, model)
+    if threshold is not None:
+        return np.flatnonzero(importance >= threshold)
+    count = max(1, int(round(keep * len(importance))))
+    return np.sort(np.argpartition(-importance, count - 1)[:count])
+
+
+def select_by_l1(vectorizer, texts, labels, C=1.0, max_iter=1000):
+    # l1_ratio=1.0 is a pure L1 penalty (penalty="l1" is deprecated)
+    sparse_model = LogisticRegression(l1_ratio=1.0, solver="saga", C=C, max_iter=max_iter)
+    sparse_model.fit(vectorizer.transform(texts), labels)
+    return np.flatnonzero(np.abs(sparse_model.coef_).max(axis=0) > 0)
+
+
+def compact_vectorizer(vectorizer, keep):
+    # Copy of the vectorizer whose vocabulary is only the kept terms, renumbered in order
+    terms = vectorizer.get_feature_names_out()
+    compacted = copy.deepcopy(vectorizer)
+    compacted.vocabulary_ = {str(terms[j]): i for i, j in enumerate(keep)}
+    if getattr(vectorizer, "use_idf", True):
+        compacted.idf_ = np.asarray(vectorizer.idf_)[keep]
+        # The inner TfidfTransformer validates its input width against this
+        if hasattr(compacted._tfidf, "n_features_in_"):
+            compacted._tfidf.n_features_in_ = len(keep)
+    # Only kept for introspection and can be large; transform never reads it
+    if hasattr(compacted, "stop_words_"):
+        del compacted.stop_words_
+    compacted.max_features = None
+    return compacted
+
+
+def compact_model(model, keep):
+    compacted = copy.deepcopy(model)
+    compacted.coef_ = np.ascontiguousarray(np.asarray(model.coef_)[:, keep])
+    if hasattr(compacted, "n_features_in_"):
+        compacted.n_features_in_ = len(keep)
+    return compacted
+
+
+def refit(model, vectorizer, texts, labels):
+    # Same estimator settings as the original model, trained on the compacted features
+    refitted = clone(model)
+    if isinstance(refitted, LogisticRegression) and refitted.penalty in ("l1", "l2"):
+        # Models pickled by older scikit-learn carry the deprecated penalty parameter
+        refitted.set_params(penalty="deprecated", l1_ratio=1.0 if refitted.penalty == "l1" else 0.0)
+    refitted.fit(vectorizer.transform(texts), labels)
+    return refitted
+
+
+def _throughput(classifier, texts, repeats=3):
+    best = min(_timed(classifier.score, texts) for _ in range(repeats))
+    return len(texts) / best
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def _load_time(path, repeats=5):
+    return min(_timed(load_bundle, path) for _ in range(repeats))
+
+
+def evaluate(bundle_path, texts, gold=None, reference_labels=None):
+    # Size, load time, throughput and accuracy of one bundle on the evaluation texts
+    vectorizer, model, manifest = load_bundle(bundle_path)
+    classifier = NewsClassifier(vectorizer, model)
+    predicted = np.asarray([r["label"] for r in classifier.classify(texts)], dtype=object)
+    report = {
+        "features": manifest["feature_dim"],
+        "bundle_bytes": os.path.getsize(bundle_path),
+        "load_seconds": _load_time(bundle_path),
+        "articles_per_second": _throughput(classifier, texts),
+    }
+    if gold is not None:
+        report["accuracy"] = float((predicted == np.asarray(gold, dtype=object)).mean())
+    if reference_labels is not None:
+        report["agreement"] = float((predicted == reference_labels).mean())
+    return report, predicted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drop low-weight features from a vectorizer/model bundle.")
+    parser.add_argument("corpus", help="CSV or Parquet with headlines/description/content (or text) and labels")
+    parser.add_argument("--bundle", default=DEFAULT_BUNDLE_PATH, help="Bundle to compact")
+    parser.add_argument("--output", default="compact_news_classifier.bundle")
+    parser.add_argument("--method", choices=("magnitude", "l1"), default="magnitude")
+    parser.add_argument("--keep", type=float, default=0.5, help="magnitude: fraction of features to keep")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="magnitude: keep features with max |coef| * idf at least this (overrides --keep)")
+    parser.add_argument("--l1-C", type=float, default=1.0, help="l1: inverse regularization strength")
+    parser.add_argument("--refit", action="store_true", help="magnitude: retrain the model on the kept features")
+    parser.add_argument("--label-column", default="category")
+    parser.add_argument("--held-out", default=None, metavar="FILE",
+                        help="Evaluate on FILE and train on all of the corpus instead of splitting it")
+    parser.add_argument("--test-size", type=float, default=0.2,
+                        help="Held-out fraction when splitting; 0.2 matches the training notebook")
+    args = parser.parse_args()
+
+    vectorizer, model, manifest = load_bundle(args.bundle)
+    if not hasattr(model, "coef_"):
+        sys.exit(f"{manifest['model_class']} has no coef_ to rank features by")
+
+    texts, gold = load_corpus(args.corpus, label_column=args.label_column)
+    original = NewsClassifier(vectorizer, model)
+    # Without gold labels the original model's predictions are the training and accuracy reference
+    labels = gold if gold is not None else [r["label"] for r in original.classify(texts)]
+    if args.held_out:
+        test_texts, test_gold = load_corpus(args.held_out, label_column=args.label_column)
+        if (gold is None) != (test_gold is None):
+            sys.exit(f"{args.corpus} and {args.held_out} must both have or both lack '{args.label_column}'")
+        train_texts, train_labels = texts, labels
+        test_labels = test_gold if test_gold is not None else [r["label"] for r in original.classify(test_texts)]
+    else:
+        # The notebook's split exactly (same rows, same order, no stratification), so the
+        # held-out part is text the original model was not trained on
+        train_texts, test_texts, train_labels, test_labels = train_test_split(
+            texts, labels, test_size=args.test_size, random_state=42,
+        )
+
+    if args.method == "l1":
+        keep = select_by_l1(vectorizer, train_texts, train_labels, C=args.l1_C)
+    else:
+        keep = select_by_magnitude(vectorizer, model, keep=args.keep, threshold=args.threshold)
+    if not len(keep):
+        sys.exit("No features left; lower --threshold or raise --keep/--l1-C")
+
+    compacted_vectorizer = compact_vectorizer(vectorizer, keep)
+    if args.method == "l1" or args.refit:
+        compacted_model = refit(model, compacted_vectorizer, train_texts, train_labels)
+    else:
+        compacted_model = compact_model(model, keep)
+
+    metadata = {
+        "method": f"compaction-{args.method}",
+        "source_bundle": os.path.abspath(args.bundle),
+        "source_vocabulary_sha256": manifest["vocabulary_sha256"],
+        "kept_features": int(len(keep)),
+        "refit": bool(args.method == "l1" or args.refit),
+    }
+    save_bundle(args.output, compacted_vectorizer, compacted_model, metadata)
+
+    gold_test = test_labels if gold is not None else None
+    before, reference_predictions = evaluate(args.bundle, test_texts, gold_test)
+    after, _ = evaluate(args.output, test_texts, gold_test, reference_predictions)
+    if gold is None:
+        # Accuracy against the original model's own predictions is the agreement rate
+        before["accuracy"], after["accuracy"] = 1.0, after["agreement"]
+
+    print(f"{'':10}{'features':>10}{'bytes':>10}{'load ms':>10}{'art/s':>10}{'accuracy':>10}")
+    for name, report in (("original", before), ("compact", after)):
+        print(f"{name:10}{report['features']:>10}{report['bundle_bytes']:>10}{report['load_seconds'] * 1000:>10.2f}"
+              f"{report['articles_per_second']:>10.0f}{report['accuracy']:>10.4f}")
+    print(
+        f"Size x{before['bundle_bytes'] / after['bundle_bytes']:.2f}, load x{before['load_seconds'] / after['load_seconds']:.2f}, "
+        f"throughput x{after['articles_per_second'] / before['articles_per_second']:.2f}, "
+        f"accuracy {after['accuracy'] - before['accuracy']:+.4f}, agreement {after['agreement']:.4f}; wrote {args.output}"
+    )
+
+    # Written again with the report in its manifest, as distill.py does
+    metadata["report"] = {"original": before, "compact": after}
+    save_bundle(args.output, compacted_vectorizer, compacted_model, metadata)
+
+
+if __name__ == "__main__":
+    main()
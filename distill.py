@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+
+from classifier import TEXT_COLUMNS, NewsClassifier, softmax
+from model_bundle import save_bundle
+from transformer_backend import TransformerClassifier
+
+# Offline distillation: a local transformer checkpoint (the teacher) scores a corpus, and
+# the TF-IDF + logistic regression student is trained on its soft targets. The teacher is
+# loaded and run by transformer_backend.TransformerClassifier, the same inference path
+# the router uses (torch, or onnxruntime for an exported directory).
+#
+# Logistic regression has no soft-label fit, but cross-entropy against a target
+# distribution p is sum_c p_c * -log q_c, which is exactly the weighted log loss of
+# one copy of the article per class with sample_weight p_c. Each article is expanded
+# that way (dropping negligible weights), optionally blended with the gold label.
+
+
+def load_corpus(path, text_columns=TEXT_COLUMNS, label_column="category"):
+    # Same text construction as the training notebook; gold labels are optional
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    present = [c for c in text_columns if c in df.columns]
+    if "text" in df.columns and not present:
+        texts = df["text"].fillna("").astype(str)
+    elif present:
+        texts = df[present].fillna("").astype(str).agg(" ".join, axis=1)
+    else:
+        raise ValueError(f"{path} has no 'text' column or any of {list(text_columns)}")
+    labels = df[label_column].astype(str).str.lower().tolist() if label_column in df.columns else None
+    return texts.tolist(), labels
+
+
+def soft_targets(teacher_probabilities, classes, gold_labels=None, alpha=1.0):
+    # Per-article target distribution: alpha * teacher + (1 - alpha) * one-hot gold label
+    targets = np.asarray(teacher_probabilities, dtype=np.float64)
+    if gold_labels is not None and alpha < 1.0:
+        index = {c: i for i, c in enumerate(classes)}
+        unknown = sorted(set(gold_labels) - set(index))
+        if unknown:
+            raise ValueError(f"Gold labels {unknown} are not teacher classes; pass --label-map")
+        one_hot = np.zeros_like(targets)
+        one_hot[np.arange(len(gold_labels)), [index[g] for g in gold_labels]] = 1.0
+        targets = alpha * targets + (1.0 - alpha) * one_hot
+    return targets
+
+
+def expand_soft_targets(targets, min_weight=1e-3):
+    # (row, class, weight) triples for the weighted-copies form of the soft-label loss
+    rows, class_indices = np.nonzero(targets >= min_weight)
+    return rows, class_indices, targets[rows, class_indices]
+
+
+def train_student(texts, targets, classes, max_features=5000, C=1.0, max_iter=1000, min_weight=1e-3):
+    vectorizer = TfidfVectorizer(max_features=max_features)
+    features = vectorizer.fit_transform(texts)
+    rows, class_indices, weights = expand_soft_targets(targets, min_weight)
+    labels = np.asarray(classes, dtype=object)[class_indices]
+    model = LogisticRegression(C=C, max_iter=max_iter)
+    model.fit(features[rows], labels, sample_weight=weights)
+    return vectorizer, model
+
+
+def per_article_latency(predict_one, texts, samples=200):
+    # Milliseconds per article at batch size 1 (p50, p95)
+    timings = []
+    for text in texts[:samples]:
+        start = time.perf_counter()
+        predict_one(text)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill a local transformer classifier into the TF-IDF + linear model.")
+    parser.add_argument("corpus", help="CSV or Parquet with headlines/description/content (or text) and optional labels")
+    parser.add_argument("teacher", help="Local transformer checkpoint directory")
+    parser.add_argument("--output", default="distilled_news_classifier.bundle", help="Student model bundle")
+    parser.add_argument("--label-column", default="category")
+    parser.add_argument("--label-map", default=None, help="JSON object mapping teacher labels to category names")
+    parser.add_argument("--temperature", type=float, default=2.0, help="Softmax temperature for teacher targets")
+    parser.add_argument("--alpha", type=float, default=1.0, help="Weight of teacher targets vs gold labels")
+    parser.add_argument("--max-features", type=int, default=5000)
+    parser.add_argument("--C", type=float, default=1.0)
+    parser.add_argument("--max-length", type=int, default=256, help="Teacher max tokens per article")
+    parser.add_argument("--batch-size", type=int, default=16, help="Teacher batch size (articles)")
+    parser.add_argument("--max-batch-tokens", type=int, default=8192, help="Teacher padded tokens per batch")
+    parser.add_argument("--threads", type=int, default=None, help="Teacher CPU threads")
+    parser.add_argument("--teacher-cache", default=None, help=".npy file to reuse teacher logits between runs")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--latency-samples", type=int, default=200)
+    args = parser.parse_args()
+
+    texts, gold = load_corpus(args.corpus, label_column=args.label_column)
+    teacher = TransformerClassifier(
+        args.teacher,
+        max_length=args.max_length,
+        max_batch_tokens=args.max_batch_tokens,
+        max_batch_size=args.batch_size,
+        num_threads=args.threads,
+        label_map=json.loads(args.label_map) if args.label_map else None,
+    )
+    classes = teacher.classes
+
+    # Teacher scoring is the expensive step, so its logits can be cached
+    if args.teacher_cache and os.path.exists(args.teacher_cache):
+        logits = np.load(args.teacher_cache)
+        if logits.shape != (len(texts), len(classes)):
+            sys.exit(f"{args.teacher_cache} does not match this corpus and teacher")
+    else:
+        start_time = time.time()
+        logits = teacher.logits(texts)
+        print(f"Teacher scored {len(texts)} articles in {time.time() - start_time:.1f}s", file=sys.stderr)
+        if args.teacher_cache:
+            np.save(args.teacher_cache, logits)
+
+    indices = np.arange(len(texts))
+    stratify = gold if gold is not None else None
+    train_idx, test_idx = train_test_split(indices, test_size=args.test_size, random_state=42, stratify=stratify)
+
+    train_texts = [texts[i] for i in train_idx]
+    targets = soft_targets(
+        softmax(logits[train_idx], args.temperature),
+        classes,
+        [gold[i] for i in train_idx] if gold is not None else None,
+        args.alpha,
+    )
+    vectorizer, model = train_student(train_texts, targets, classes, max_features=args.max_features, C=args.C)
+    student = NewsClassifier(vectorizer, model)
+
+    # Accuracy on held-out articles: against gold labels when present, else agreement with the teacher
+    test_texts = [texts[i] for i in test_idx]
+    teacher_pred = np.asarray(classes, dtype=object)[logits[test_idx].argmax(axis=1)]
+    student_pred = np.asarray([r["label"] for r in student.classify(test_texts)], dtype=object)
+    report = {"test_articles": len(test_idx), "temperature": args.temperature, "alpha": args.alpha}
+    if gold is not None:
+        reference = np.asarray([gold[i] for i in test_idx], dtype=object)
+        report["teacher_accuracy"] = float((teacher_pred == reference).mean())
+        report["student_accuracy"] = float((student_pred == reference).mean())
+    report["student_teacher_agreement"] = float((student_pred == teacher_pred).mean())
+
+    teacher_p50, teacher_p95 = per_article_latency(lambda t: teacher.logits([t]), test_texts, args.latency_samples)
+    student_p50, student_p95 = per_article_latency(student.classify_one, test_texts, args.latency_samples)
+    report.update({
+        "teacher_latency_ms_p50": teacher_p50,
+        "teacher_latency_ms_p95": teacher_p95,
+        "student_latency_ms_p50": student_p50,
+        "student_latency_ms_p95": student_p95,
+    })
+
+    save_bundle(args.output, vectorizer, model, {
+        "method": "distillation",
+        "teacher": os.path.abspath(args.teacher),
+        "corpus": os.path.abspath(args.corpus),
+        "vectorizer": f"TfidfVectorizer(max_features={args.max_features})",
+        "model": f"LogisticRegression(C={args.C}, max_iter=1000)",
+        "report": report,
+    })
+
+    print(f"{'':10}{'accuracy':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'teacher':10}{report.get('teacher_accuracy', float('nan')):>10.3f}{teacher_p50:>10.2f}{teacher_p95:>10.2f}")
+    print(f"{'student':10}{report.get('student_accuracy', float('nan')):>10.3f}{student_p50:>10.2f}{student_p95:>10.2f}")
+    print(f"Student/teacher agreement {report['student_teacher_agreement']:.3f}; wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import numpy as np
+
+from model_bundle import idf_weights
+
+
+def _top_positive(terms, contributions, top_n):
+    # Largest positive contributions first, using partial selection when there are many terms
+    if top_n <= 0:
+        return []
+    if contributions.shape[0] > top_n:
+        keep = np.argpartition(-contributions, top_n - 1)[:top_n]
+        terms, contributions = terms[keep], contributions[keep]
+    order = np.argsort(-contributions)
+    return [(str(terms[i]), float(contributions[i])) for i in order if contributions[i] > 0]
+
+
+class ContributionTable:
+    # Precomputed token -> per-class contribution weights for a linear model over TF-IDF.
+    #
+    # A class score is sum_j W_cj * x_j + b_c, so token j adds W_cj * x_j to class c.
+    # `weights` holds W transposed (one row per token) for TF-IDF feature values, which
+    # already include idf and normalization. `count_weights` folds idf_j in as well, for
+    # callers that keep raw term counts and the norm themselves (the live scorer).
+    # Looking up the nonzero tokens of an article is all an explanation costs.
+
+    def __init__(self, vectorizer, model):
+        if not hasattr(model, "coef_"):
+            raise ValueError("Explanations need a linear model with coef_")
+
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        if coef.shape[0] == 1:
+            # Binary models only score the positive class
+            coef = np.vstack([-coef, coef])
+
+        self.terms = np.asarray(vectorizer.get_feature_names_out(), dtype=object)
+        self.weights = np.ascontiguousarray(coef.T)
+
+        self.count_weights = self.weights * idf_weights(vectorizer)[:, None]
+
+    def explain_features(self, features, class_indices, top_n=5):
+        # Top terms for each row of a TF-IDF CSR matrix, towards that row's class index
+        features = features.tocsr()
+        # Contributions for every nonzero entry at once; only the per-row top-n loops
+        row_classes = np.repeat(np.asarray(class_indices), np.diff(features.indptr))
+        contributions = features.data * self.weights[features.indices, row_classes]
+        explanations = []
+        for row in range(features.shape[0]):
+            start, end = features.indptr[row], features.indptr[row + 1]
+            explanations.append(
+                _top_positive(self.terms[features.indices[start:end]], contributions[start:end], top_n)
+            )
+        return explanations
+
+    def explain_counts(self, indices, tf, scale, class_index, top_n=5):
+        # Same, from raw term frequencies and the document's TF-IDF norm
+        if len(indices) == 0 or scale <= 0:
+            return []
+        indices = np.asarray(indices)
+        contributions = np.asarray(tf, dtype=np.float64) * self.count_weights[indices, class_index] / scale
+        return _top_positive(self.terms[indices], contributions, top_n)
@@ -0,0 +1,223 @@
+import re
+
+import numpy as np
+
+from classifier import softmax
+from explain import ContributionTable
+from model_bundle import idf_weights
+
+# Token patterns whose tokens are runs of word characters, so any non-word character is
+# a safe place to cut the text when re-tokenizing only the edited region
+WORD_RUN_PATTERNS = (r"(?u)\b\w\w+\b", r"(?u)\b\w+\b", r"\b\w\w+\b", r"\b\w+\b")
+
+_WORD_CHAR = re.compile(r"\w")
+
+
+def _common_prefix(a, b):
+    # Binary search on slice equality keeps the character comparisons in C
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a, b, limit):
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class IncrementalScorer:
+    # Keeps per-class scores for a text being edited, updating them from the edit alone.
+    #
+    # For a linear model over TF-IDF the class scores are
+    #     score_c = sum_j W_cj * tf_j * idf_j / norm(tf * idf) + b_c
+    # so the scorer keeps the term counts, the unnormalized dot products and the squared
+    # norm. Each update re-tokenizes only the changed span (widened to word boundaries)
+    # and adjusts those sums for the terms whose counts changed. Probabilities are a
+    # softmax over the scores, which matches predict_proba for multinomial logistic
+    # regression and NewsClassifier.score for models without predict_proba.
+    #
+    # Vectorizer settings that break the word-boundary argument (n-grams, custom
+    # analyzers or tokenizers) fall back to re-vectorizing the whole text.
+
+    def __init__(self, vectorizer, model, resync_every=1000):
+        if not hasattr(model, "coef_") or not hasattr(model, "intercept_"):
+            raise ValueError("IncrementalScorer needs a linear model with coef_ and intercept_")
+
+        self.vectorizer = vectorizer
+        self.model = model
+        self.classes = [str(c) for c in model.classes_]
+        self.resync_every = resync_every
+
+        self.vocabulary = vectorizer.vocabulary_
+        self.idf = idf_weights(vectorizer)
+
+        # Column j is W[:, j] * idf_j, so a count change only touches one column
+        self.weights = np.ascontiguousarray((np.asarray(model.coef_, dtype=np.float64) * self.idf).T)
+        self.intercept = np.asarray(model.intercept_, dtype=np.float64)
+        self.contributions = ContributionTable(vectorizer, model)
+
+        self.norm = getattr(vectorizer, "norm", "l2")
+        self.sublinear_tf = getattr(vectorizer, "sublinear_tf", False)
+        self.binary = getattr(vectorizer, "binary", False)
+
+        self.incremental = (
+            getattr(vectorizer, "analyzer", "word") == "word"
+            and tuple(getattr(vectorizer, "ngram_range", (1, 1))) == (1, 1)
+            and getattr(vectorizer, "tokenizer", None) is None
+            and getattr(vectorizer, "token_pattern", None) in WORD_RUN_PATTERNS
+            and self.norm in ("l2", "l1", None)
+        )
+        if self.incremental:
+            preprocess = vectorizer.build_preprocessor()
+            tokenize = vectorizer.build_tokenizer()
+            self._tokenize = lambda text: tokenize(preprocess(text))
+
+        self.reset()
+
+    def reset(self, text=""):
+        self.text = ""
+        self.counts = {}  # vocabulary index -> raw count
+        self.dot = np.zeros(self.weights.shape[1])
+        self.norm_sum = 0.0
+        self.edits = 0
+        if text:
+            self.update(text)
+
+    def _tf(self, count):
+        if count <= 0:
+            return 0.0
+        if self.binary:
+            return 1.0
+        if self.sublinear_tf:
+            return 1.0 + np.log(count)
+        return float(count)
+
+    def _norm_term(self, tf, j):
+        value = tf * self.idf[j]
+        return value * value if self.norm == "l2" else value
+
+    def _apply(self, deltas):
+        for j, delta in deltas.items():
+            if not delta:
+                continue
+            old = self.counts.get(j, 0)
+            new = old + delta
+            old_tf, new_tf = self._tf(old), self._tf(new)
+            if new_tf != old_tf:
+                self.dot += (new_tf - old_tf) * self.weights[j]
+                self.norm_sum += self._norm_term(new_tf, j) - self._norm_term(old_tf, j)
+            if new:
+                self.counts[j] = new
+            else:
+                del self.counts[j]
+
+    def _count(self, text, sign, deltas):
+        vocabulary = self.vocabulary
+        for token in self._tokenize(text):
+            j = vocabulary.get(token)
+            if j is not None:
+                deltas[j] = deltas.get(j, 0) + sign
+
+    def _edit_window(self, old, new):
+        # Span [start, old_end) of old replaced by [start, new_end) of new, widened to word boundaries
+        prefix = _common_prefix(old, new)
+        suffix = _common_suffix(old, new, min(len(old), len(new)) - prefix)
+
+        start = prefix
+        while start > 0 and _WORD_CHAR.match(old, start - 1):
+            start -= 1
+
+        # The suffix is shared, so widening it moves both ends by the same amount
+        old_end, new_end = len(old) - suffix, len(new) - suffix
+        while old_end < len(old) and _WORD_CHAR.match(old, old_end):
+            old_end += 1
+            new_end += 1
+        return start, old_end, new_end
+
+    def resync(self):
+        # Recompute everything from the current text to drop accumulated float error
+        text = self.text
+        self.text = ""
+        self.counts = {}
+        self.dot = np.zeros(self.weights.shape[1])
+        self.norm_sum = 0.0
+        deltas = {}
+        self._count(text, 1, deltas)
+        self._apply(deltas)
+        self.text = text
+        self.edits = 0
+
+    def update(self, text):
+        # Move to the new text and return the class probabilities
+        if not self.incremental:
+            self.text = text
+            features = self.vectorizer.transform([text])
+            scores = np.asarray(self.model.decision_function(features), dtype=np.float64)[0]
+            return self._probabilities(np.atleast_1d(scores))
+
+        if text != self.text:
+            start, old_end, new_end = self._edit_window(self.text, text)
+            deltas = {}
+            self._count(self.text[start:old_end], -1, deltas)
+            self._count(text[start:new_end], 1, deltas)
+            self._apply(deltas)
+            self.text = text
+            self.edits += 1
+            if self.edits >= self.resync_every:
+                self.resync()
+
+        return self.probabilities()
+
+    def _scale(self):
+        if self.norm is None:
+            return 1.0
+        if self.norm == "l2":
+            return np.sqrt(self.norm_sum) if self.norm_sum > 0 else 0.0
+        return self.norm_sum
+
+    def scores(self):
+        scale = self._scale()
+        dot = self.dot / scale if scale > 0 else np.zeros_like(self.dot)
+        return dot + self.intercept
+
+    def _probabilities(self, scores):
+        if scores.shape[0] == 1:
+            # Binary models score only the positive class
+            scores = np.array([0.0, scores[0]])
+        return softmax(scores)
+
+    def probabilities(self):
+        return self._probabilities(self.scores())
+
+    def explain(self, class_index, top_n=5):
+        # Top contributing terms of the current text, from the kept counts
+        if not self.incremental:
+            features = self.vectorizer.transform([self.text])
+            return self.contributions.explain_features(features, [class_index], top_n)[0]
+        indices = list(self.counts)
+        tf = [self._tf(self.counts[j]) for j in indices]
+        return self.contributions.explain_counts(indices, tf, self._scale(), class_index, top_n)
+
+    def classify(self, text, explain_top_n=None):
+        probabilities = self.update(text)
+        best = int(np.argmax(probabilities))
+        result = {
+            "label": self.classes[best],
+            "confidence": float(probabilities[best]),
+            "probabilities": probabilities,
+            "duplicate_of_similarity": None,
+        }
+        if explain_top_n is not None:
+            result["explanation"] = self.explain(best, explain_top_n)
+        return result
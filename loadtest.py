@@ -0,0 +1,320 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from classifier import add_model_arguments, article_text, classifier_from_args
+from near_duplicates import NearDuplicateIndex
+from pipeline import parse_line
+from server import rss_mb
+
+# Open-loop load generator. Requests are scheduled at a fixed or Poisson arrival rate
+# regardless of how fast earlier ones finish, so a saturated engine shows up as growing
+# queueing delay rather than as a quietly lower request rate.
+#
+#   queueing delay = start - scheduled   (waiting for a free client worker)
+#   service time   = end - start
+#   latency        = end - scheduled     (what a caller at that arrival rate would see)
+#
+# Targets are the classifier in this process or a local server.py over HTTP. Memory is
+# the target's resident set size, sampled during the run. A stored baseline report is
+# compared against with relative thresholds and the run fails on any regression.
+
+# Metric -> (direction that is worse, default allowed relative change)
+THRESHOLDS = {
+    "throughput": ("lower", 0.10),
+    "latency_ms_p50": ("higher", 0.25),
+    "latency_ms_p99": ("higher", 0.25),
+    "queue_ms_p99": ("higher", 0.50),
+    "memory_growth_mb": ("higher", 0.50),
+}
+MEMORY_SLACK_MB = 5.0  # Absolute growth below this never counts as a regression
+
+
+def load_texts(path, sample=None, seed=0):
+    # CSV/Parquet corpora as in training; JSON lines or plain text one article per line
+    if path.endswith((".csv", ".parquet")):
+        from distill import load_corpus
+
+        texts, _ = load_corpus(path)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            records = (parse_line(line, i) for i, line in enumerate(f))
+            texts = [article_text(r) for r in records if r is not None]
+    if not texts:
+        raise ValueError(f"No articles in {path}")
+    if sample is not None and sample < len(texts):
+        rng = np.random.default_rng(seed)
+        texts = [texts[i] for i in rng.choice(len(texts), sample, replace=False)]
+    return texts
+
+
+class InProcessTarget:
+    name = "in-process"
+
+    def __init__(self, classifier):
+        self.classifier = classifier
+
+    def send(self, texts):
+        return self.classifier.classify(texts)
+
+    def rss(self):
+        return rss_mb()
+
+
+class HttpTarget:
+    name = "http"
+
+    def __init__(self, url, pid=None, timeout=30.0):
+        self.url = url.rstrip("/")
+        self.pid = pid
+        self.timeout = timeout
+
+    def send(self, texts):
+        request = urllib.request.Request(
+            self.url + "/classify",
+            data=json.dumps({"texts": texts}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())["results"]
+
+    def rss(self):
+        if self.pid is not None:
+            return rss_mb(self.pid)
+        try:
+            with urllib.request.urlopen(self.url + "/health", timeout=self.timeout) as response:
+                return json.loads(response.read()).get("rss_mb")
+        except OSError:
+            return None
+
+
+def start_local_server(args, port, timeout=60.0):
+    # server.py in a child process, so its memory is measured apart from the load generator.
+    # Its output goes to a log file (an undrained pipe would eventually block it) and it
+    # counts as ready once GET /health answers.
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"),
+               "--port", str(port), "--bundle", args.bundle]
+    if args.vectorizer or args.model:
+        command += ["--vectorizer", args.vectorizer, "--model", args.model]
+    if args.bundle_sha256:
+        command += ["--bundle-sha256", args.bundle_sha256]
+    if args.dedup:
+        command.append("--dedup")
+    log_fd, log_path = tempfile.mkstemp(prefix="loadtest-server-", suffix=".log")
+    with os.fdopen(log_fd, "w") as log:
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + timeout
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"server.py exited with code {process.returncode}; see {log_path}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1.0):
+                return process
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            process.terminate()
+            process.wait()
+            raise RuntimeError(f"server.py did not answer /health within {timeout:g}s; see {log_path}")
+        time.sleep(0.1)
+
+
+def arrival_times(count, rate, poisson=True, seed=0):
+    # Seconds from the start of the run at which each request is due
+    if poisson:
+        gaps = np.random.default_rng(seed).exponential(1.0 / rate, count)
+        return np.cumsum(gaps) - gaps[0]
+    return np.arange(count) / rate
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else None
+
+
+def run_load(target, texts, rate, duration, batch_size=1, concurrency=8, poisson=True, interval=1.0,
+             warmup=20, seed=0):
+    # Replays texts (cycling through them) for `duration` seconds and returns the report dict
+    for i in range(0, min(warmup, len(texts)), batch_size):
+        target.send(texts[i:i + batch_size])
+
+    schedule = arrival_times(max(1, int(rate * duration)), rate, poisson, seed)
+    count = len(schedule)
+    scheduled = np.empty(count)
+    started = np.full(count, np.nan)
+    finished = np.full(count, np.nan)
+    errors = []
+    memory = []
+    done = threading.Event()
+
+    def sample_memory(run_start):
+        while True:
+            memory.append((time.perf_counter() - run_start, target.rss()))
+            if done.wait(interval):
+                return
+
+    def request(i, offset):
+        started[i] = time.perf_counter()
+        try:
+            target.send([texts[(offset + j) % len(texts)] for j in range(batch_size)])
+        except Exception as exc:
+            errors.append(repr(exc))
+        finished[i] = time.perf_counter()
+
+    run_start = time.perf_counter()
+    sampler = threading.Thread(target=sample_memory, args=(run_start,), daemon=True)
+    sampler.start()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i, due in enumerate(schedule):
+            delay = run_start + due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            scheduled[i] = run_start + due
+            executor.submit(request, i, i * batch_size)
+    elapsed = time.perf_counter() - run_start
+    done.set()
+    sampler.join()
+    memory.append((elapsed, target.rss()))
+
+    queue_ms = (started - scheduled) * 1000
+    service_ms = (finished - started) * 1000
+    latency_ms = (finished - scheduled) * 1000
+
+    # Per-interval series by completion time, to see whether latency or memory drifts
+    series = []
+    offsets = finished - run_start
+    for start in np.arange(0.0, elapsed, interval):
+        window = (offsets >= start) & (offsets < start + interval)
+        rss = [m for t, m in memory if start <= t < start + interval and m is not None]
+        series.append({
+            "t": round(float(start), 3),
+            "completed": int(window.sum()) * batch_size,
+            "latency_ms_p99": _percentile(latency_ms[window], 99),
+            "queue_ms_p99": _percentile(queue_ms[window], 99),
+            "rss_mb": rss[-1] if rss else None,
+        })
+
+    rss_values = [m for _, m in memory if m is not None]
+    return {
+        "target": target.name,
+        "requests": count,
+        "articles": count * batch_size,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "arrival_rate": rate,
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "throughput": count * batch_size / elapsed,
+        "queue_ms_p50": _percentile(queue_ms, 50),
+        "queue_ms_p99": _percentile(queue_ms, 99),
+        "service_ms_p50": _percentile(service_ms, 50),
+        "service_ms_p99": _percentile(service_ms, 99),
+        "latency_ms_p50": _percentile(latency_ms, 50),
+        "latency_ms_p99": _percentile(latency_ms, 99),
+        "rss_mb_start": rss_values[0] if rss_values else None,
+        "rss_mb_end": rss_values[-1] if rss_values else None,
+        "memory_growth_mb": rss_values[-1] - rss_values[0] if rss_values else None,
+        "series": series,
+    }
+
+
+def regressions(report, baseline, tolerance=None):
+    # Human-readable list of metrics that got worse than the baseline allows
+    failures = []
+    for setting in ("target", "arrival_rate", "batch_size", "concurrency"):
+        if baseline.get(setting) != report[setting]:
+            failures.append(f"baseline was run with {setting}={baseline.get(setting)}, this run {report[setting]}")
+    if report["errors"]:
+        failures.append(f"{report['errors']} failed requests (first: {report['first_error']})")
+    for metric, (worse, allowed) in THRESHOLDS.items():
+        allowed = tolerance.get(metric, allowed) if tolerance else allowed
+        current, reference = report.get(metric), baseline.get(metric)
+        if current is None or reference is None:
+            continue
+        if metric == "memory_growth_mb":
+            limit = max(reference, 0.0) * (1 + allowed) + MEMORY_SLACK_MB
+        elif worse == "higher":
+            limit = reference * (1 + allowed)
+        else:
+            limit = reference * (1 - allowed)
+        if (worse == "higher" and current > limit) or (worse == "lower" and current < limit):
+            failures.append(f"{metric} {current:.2f} vs baseline {reference:.2f} (limit {limit:.2f})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a corpus against the classifier at a fixed arrival rate.")
+    parser.add_argument("corpus", help="CSV/Parquet corpus, JSON lines or plain text (one article per line)")
+    parser.add_argument("--target", choices=("in-process", "server"), default="in-process")
+    parser.add_argument("--url", default=None, help="Existing server URL; default starts server.py locally")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the locally started server")
+    add_model_arguments(parser)
+    parser.add_argument("--dedup", action="store_true", help="Reuse results for near-duplicate articles")
+    parser.add_argument("--rate", type=float, default=50.0, help="Requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--batch-size", type=int, default=1, help="Articles per request")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client workers sending requests")
+    parser.add_argument("--constant", action="store_true", help="Evenly spaced arrivals instead of Poisson")
+    parser.add_argument("--sample", type=int, default=5000, help="Articles sampled from the corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds per time-series point")
+    parser.add_argument("--report", default=None, help="Write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="Fail on regression against this report")
+    parser.add_argument("--save-baseline", default=None, help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", default=None,
+                        help='JSON object overriding allowed relative changes, e.g. {"latency_ms_p99": 0.5}')
+    args = parser.parse_args()
+
+    texts = load_texts(args.corpus, args.sample, args.seed)
+    process = None
+    if args.target == "in-process":
+        dedup_index = NearDuplicateIndex() if args.dedup else None
+        target = InProcessTarget(classifier_from_args(args, dedup_index=dedup_index))
+    elif args.url:
+        target = HttpTarget(args.url)
+    else:
+        process = start_local_server(args, args.port)
+        target = HttpTarget(f"http://127.0.0.1:{args.port}", pid=process.pid)
+
+    try:
+        report = run_load(target, texts, args.rate, args.duration, batch_size=args.batch_size,
+                          concurrency=args.concurrency, poisson=not args.constant, interval=args.interval,
+                          seed=args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(
+        f"{report['target']}: {report['articles']} articles in {report['elapsed_s']:.1f}s "
+        f"({report['throughput']:.1f}/s at {args.rate:g} req/s), latency p50 {report['latency_ms_p50']:.2f} ms "
+        f"p99 {report['latency_ms_p99']:.2f} ms, queueing p99 {report['queue_ms_p99']:.2f} ms, "
+        f"memory {report['rss_mb_start'] or 0:.1f} -> {report['rss_mb_end'] or 0:.1f} MB, {report['errors']} errors",
+        file=sys.stderr,
+    )
+    for path in (args.report, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = regressions(report, baseline, json.loads(args.tolerance) if args.tolerance else None)
+        if failures:
+            sys.exit("Regression against baseline:\n  " + "\n  ".join(failures))
+        print("No regression against baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,37 @@ from flet import (
     alignment, padding, margin, border, border_radius, animation,
     transform, Scale, Stack, Ref, RoundedRectangleBorder
 )
-import joblib
+import os
+import threading
 import time
-import random
 
-# Load vectorizer and model
-vectorizer = joblib.load("tfidf_vectorizer.pkl")
-model = joblib.load("best_news_classification_model.pkl")
+from batch_view import UPLOAD_DIR, build_batch_view
+from classifier import load_classifier
+from model_bundle import DEFAULT_BUNDLE_PATH
+from incremental import IncrementalScorer
+from monitor import ClassifierMonitor
+from near_duplicates import NearDuplicateIndex
+from ui_updates import UiUpdater
+
+# sha256 of the shipped news_classifier.bundle; update it together with the bundle
+BUNDLE_SHA256 = "ca03a4f4e3491ce532047230d5d3c0c34733568f54979cba12442e6a8b50bafd"
+
+# Load the validated vectorizer + model bundle next to this file (one read, checked up front,
+# and pinned to BUNDLE_SHA256 before it is unpickled).
+# NEWS_DEDUP=1 puts near-duplicate reuse in front of the model; it is off by default
+# because fingerprinting costs about as much as the scoring it would save.
+classifier = load_classifier(
+    DEFAULT_BUNDLE_PATH,
+    expected_sha256=BUNDLE_SHA256,
+    dedup_index=NearDuplicateIndex(similarity_threshold=0.95, max_entries=50000)
+    if os.environ.get("NEWS_DEDUP") == "1" else None,
+)
+
+# NEWS_MONITOR_FILE=path appends a rolling confidence/class/latency snapshot every minute
+if os.environ.get("NEWS_MONITOR_FILE"):
+    classifier.monitor = ClassifierMonitor(
+        classifier.classes, dump_path=os.environ["NEWS_MONITOR_FILE"], dump_every=60.0
+    )
 
 def main(page: Page):
     # Page configuration with Midnight Purple theme
@@ -32,6 +56,11 @@ def main(page: Page):
         "Poppins-SemiBold": "https://github.com/google/fonts/raw/main/ofl/poppins/Poppins-SemiBold.ttf",
     }
     
+    # Batched UI updates: one round trip per interaction, only for controls that changed
+    ui = UiUpdater(page)
+    if ui.measure:
+        page.on_disconnect = lambda e: print(f"[ui] session: {ui.summary()}")
+    
     # Track device type
     is_mobile = False
     
@@ -43,6 +72,10 @@ def main(page: Page):
         "politics": {"color": "#9a67ea", "icon": icons.GAVEL_ROUNDED},  # Lavender
         "sport": {"color": "#ff7e5f", "icon": icons.SPORTS_SOCCER_ROUNDED},  # Bright coral (replaced green)
         "tech": {"color": "#8252c8", "icon": icons.COMPUTER_ROUNDED},  # Medium purple
+        "sports": {"color": "#ff7e5f", "icon": icons.SPORTS_SOCCER_ROUNDED},  # Bright coral
+        "technology": {"color": "#8252c8", "icon": icons.COMPUTER_ROUNDED},  # Medium purple
+        "education": {"color": "#c39af7", "icon": icons.SCHOOL_ROUNDED},  # Pale lilac
+        "health": {"color": "#e573b7", "icon": icons.LOCAL_HOSPITAL_ROUNDED},  # Orchid pink
         "default": {"color": "#9a67ea", "icon": icons.ARTICLE_ROUNDED}  # Lavender (default)
     }
     
@@ -150,11 +183,13 @@ def main(page: Page):
     category_indicators = {}
     category_percentage_refs = {}
     category_bar_refs = {}
-    categories = ["business", "entertainment", "politics", "sport", "tech"]
+    # Categories come from the loaded model so the bars always line up with its probabilities
+    categories = [c.lower() for c in classifier.classes]
     
     category_row_refs = {}
     
     for category in categories:
+        color_info = category_colors.get(category, category_colors["default"])
         category_percentage_refs[category] = Ref[Text]()
         category_bar_refs[category] = Ref[Container]()
         category_row_refs[category] = Ref[Row]()
@@ -165,13 +200,13 @@ def main(page: Page):
             controls=[
                 Container(
                     content=Icon(
-                        category_colors[category]["icon"], 
+                        color_info["icon"], 
                         color="#e0e0f0", 
                         size=20
                     ),
                     width=35,
                     height=35,
-                    bgcolor=category_colors[category]["color"],
+                    bgcolor=color_info["color"],
                     border_radius=border_radius.all(8),
                     alignment=alignment.center,
                 ),
@@ -195,7 +230,7 @@ def main(page: Page):
                             ref=category_bar_refs[category],
                             width=0,
                             height=12,
-                            bgcolor=category_colors[category]["color"],
+                            bgcolor=color_info["color"],
                             border_radius=border_radius.all(6),
                             animate=animation.Animation(300, "easeOut"),
                         ),
@@ -270,6 +305,31 @@ def main(page: Page):
         animate=animation.Animation(300, "easeOutQuint"),
     )
     
+    # Key terms that drove the prediction (filled from the explanation returned with the scores)
+    key_terms_row_ref = Ref[Row]()
+    key_terms = Container(
+        content=Column(
+            [
+                Row(
+                    [
+                        Icon(icons.KEY_ROUNDED, size=18, color="#9a67ea"),
+                        Text("Key terms", size=14, color="#c8c8e0", font_family="Poppins-Medium")
+                    ],
+                    spacing=5,
+                ),
+                Row(
+                    ref=key_terms_row_ref,
+                    controls=[],
+                    wrap=True,
+                    spacing=8,
+                    run_spacing=8,
+                ),
+            ],
+            spacing=8,
+        ),
+        margin=margin.only(bottom=10),
+    )
+    
     # Create refs for statistic text values
     confidence_text_ref = Ref[Text]()
     processing_time_ref = Ref[Text]()
@@ -438,6 +498,7 @@ def main(page: Page):
                     spacing=8
                 ),
                 prediction_display,
+                key_terms,
                 stats_row,
                 stats_col,  # Include both layouts and toggle visibility
             ],
@@ -458,18 +519,18 @@ def main(page: Page):
     )
     
     # Update result card function with proper animations and responsive adjustments
-    def update_result_card(prediction, probabilities, processing_time):
+    # (changes are queued on the updater; callers flush once per interaction)
+    def update_result_card(prediction, probabilities, processing_time, explanation=None):
         # Calculate word count
         word_count = len(input_field.value.split())
-        word_count_ref.current.value = str(word_count)
+        ui.set(word_count_ref.current, value=str(word_count))
         
         # Update processing time
-        processing_time_ref.current.value = f"{processing_time:.2f}s"
+        ui.set(processing_time_ref.current, value=f"{processing_time:.2f}s")
         
         # Get highest probability and its value
         max_prob = max(probabilities)
-        max_prob_index = probabilities.index(max_prob)
-        confidence_text_ref.current.value = f"{int(max_prob * 100)}%"
+        ui.set(confidence_text_ref.current, value=f"{int(max_prob * 100)}%")
         
         # Ensure the prediction is lowercase to match category keys
         prediction = prediction.lower()
@@ -485,31 +546,64 @@ def main(page: Page):
             confidence = int(probabilities[i] * 100)
             
             # Update bar width with animation, scaled for screen size
-            category_bar_refs[category].current.width = confidence * bar_scale
+            ui.set(category_bar_refs[category].current, width=confidence * bar_scale)
             
             # Update percentage text
-            category_percentage_refs[category].current.value = f"{confidence}%"
+            ui.set(category_percentage_refs[category].current, value=f"{confidence}%")
             
             # Highlight the selected category
             if category == prediction:
-                category_indicators[category].bgcolor = ft.colors.with_opacity(0.2, category_colors[category]["color"])
-                category_indicators[category].border = border.all(2, category_colors[category]["color"])
+                highlight_color = category_colors.get(category, category_colors["default"])["color"]
+                ui.set(
+                    category_indicators[category],
+                    bgcolor=ft.colors.with_opacity(0.2, highlight_color),
+                    border=border.all(2, highlight_color),
+                )
             else:
-                category_indicators[category].bgcolor = "#2a2640"  # Dark background
-                category_indicators[category].border = None
+                ui.set(category_indicators[category], bgcolor="#2a2640", border=None)  # Dark background
         
         # Update final prediction display
-        prediction_text_ref.current.value = f"Classified as: {prediction.capitalize()}"
+        ui.set(prediction_text_ref.current, value=f"Classified as: {prediction.capitalize()}")
         
         # Use safe access to category_colors with fallback to default
         color_info = category_colors.get(prediction, category_colors["default"])
-        prediction_icon_ref.current.name = color_info["icon"]
-        prediction_display_ref.current.bgcolor = color_info["color"]
+        ui.set(prediction_icon_ref.current, name=color_info["icon"])
+        ui.set(prediction_display_ref.current, bgcolor=color_info["color"])
+        
+        # Key term chips, strongest contribution first
+        term_chips = [
+            Container(
+                content=Text(f"{term}  +{weight:.2f}", size=12, color="#e0e0f0", font_family="Poppins-Medium"),
+                bgcolor=ft.colors.with_opacity(0.25, color_info["color"]),
+                border=border.all(1, color_info["color"]),
+                border_radius=border_radius.all(10),
+                padding=padding.symmetric(horizontal=10, vertical=4),
+            )
+            for term, weight in (explanation or [])
+        ]
+        ui.set(key_terms_row_ref.current, controls=term_chips)
         
         # Hide progress indicator
-        progress_ref.current.visible = False
+        ui.set(progress_ref.current, visible=False)
+    
+    # Back to the empty state shown before any analysis (queued like update_result_card)
+    def reset_result_card():
+        # Reset stats
+        ui.set(confidence_text_ref.current, value="0%")
+        ui.set(processing_time_ref.current, value="0.00s")
+        ui.set(word_count_ref.current, value="0")
         
-        page.update()
+        # Reset bars
+        for category in categories:
+            ui.set(category_bar_refs[category].current, width=0)
+            ui.set(category_percentage_refs[category].current, value="0%")
+            ui.set(category_indicators[category], bgcolor="#2a2640", border=None)  # Dark background
+        
+        # Reset prediction
+        ui.set(prediction_text_ref.current, value="Analysis will appear here")
+        ui.set(prediction_icon_ref.current, name=icons.ANALYTICS_ROUNDED)
+        ui.set(prediction_display_ref.current, bgcolor="#9a67ea")
+        ui.set(key_terms_row_ref.current, controls=[])
     
     # Advanced analysis function with animated results
     def classify_article_with_animation(e):
@@ -534,33 +628,22 @@ def main(page: Page):
                 close_icon_color="#e0e0f0"
             )
             page.snack_bar.open = True
-            page.update()
+            ui.mark_page()
+            ui.flush()
             return
         
-        # Show progress animation
-        progress_ref.current.visible = True
-        page.update()
+        # Show progress animation (its own update so it appears before the work starts)
+        ui.set(progress_ref.current, visible=True)
+        ui.flush()
         
         # Record start time
         start_time = time.time()
         
         # Process with model
-        vec_input = vectorizer.transform([user_input])
-        prediction = model.predict(vec_input)[0]
-        
-        # Get prediction probabilities if available
-        try:
-            probabilities = model.predict_proba(vec_input)[0].tolist()
-        except:
-            # If predict_proba not available, generate mock probabilities for demo
-            # In a real application, you'd use the actual model probabilities
-            highest = random.uniform(0.6, 0.9)
-            remaining = 1 - highest
-            probabilities = [random.uniform(0, remaining/4) for _ in range(4)]
-            probabilities.insert(categories.index(prediction.lower()), highest)
-            # Normalize to sum to 1
-            total = sum(probabilities)
-            probabilities = [p/total for p in probabilities]
+        # Top contributing terms come back from the same pass
+        result = classifier.classify_one(user_input, explain_top_n=6)
+        prediction = result["label"]
+        probabilities = result["probabilities"].tolist()
         
         # Calculate processing time
         processing_time = time.time() - start_time
@@ -569,7 +652,7 @@ def main(page: Page):
         time.sleep(0.5)
         
         # Update UI with results
-        update_result_card(prediction, probabilities, processing_time)
+        update_result_card(prediction, probabilities, processing_time, result["explanation"])
         
         # Show success message - Changed from green to bright cyan for better visibility
         page.snack_bar = ft.SnackBar(
@@ -591,7 +674,56 @@ def main(page: Page):
             close_icon_color="#1e1b2e"
         )
         page.snack_bar.open = True
-        page.update()
+        
+        # Results, hidden progress ring and snack bar go out in one update
+        ui.mark_page()
+        ui.flush()
+
+    # Live analysis: rescore as the user types, debounced, applying only each edit's delta
+    live_scorer = IncrementalScorer(classifier.vectorizer, classifier.model)
+    live_lock = threading.Lock()
+    live_timer = None
+    live_delay = 0.15  # Seconds of typing pause before rescoring
+    
+    def run_live_analysis():
+        text = input_field_ref.current.value or ""
+        with live_lock:
+            if not text.strip():
+                # All text deleted: drop the stale prediction, as the Clear button does
+                reset_result_card()
+                ui.flush()
+                return
+            start_time = time.time()
+            result = live_scorer.classify(text, explain_top_n=6)
+            processing_time = time.time() - start_time
+        update_result_card(result["label"], result["probabilities"].tolist(), processing_time, result["explanation"])
+        ui.flush()
+    
+    def on_input_change(e):
+        nonlocal live_timer
+        if not live_switch.value:
+            return
+        # Restart the debounce timer on every keystroke
+        if live_timer is not None:
+            live_timer.cancel()
+        live_timer = threading.Timer(live_delay, run_live_analysis)
+        live_timer.daemon = True
+        live_timer.start()
+    
+    def on_live_toggle(e):
+        if live_switch.value:
+            run_live_analysis()
+    
+    input_field.on_change = on_input_change
+    
+    live_switch = ft.Switch(
+        label="Live",
+        value=False,
+        active_color="#9a67ea",
+        label_style=TextStyle(color="#c8c8e0", font_family="Poppins-Medium"),
+        tooltip="Reclassify while typing",
+        on_change=on_live_toggle,
+    )
 
     # Sample article function with multiple options
     def load_sample_article(e, sample_type="tech"):
@@ -622,8 +754,8 @@ def main(page: Page):
         
         # Shortened samples for mobile
         
-        input_field_ref.current.value = samples[sample_type]
-        page.update()
+        ui.set(input_field_ref.current, value=samples[sample_type])
+        ui.flush()
 
     # Sample buttons dropdown
     sample_dropdown = ft.PopupMenuButton(
@@ -686,26 +818,9 @@ def main(page: Page):
 
     # Clear text function
     def clear_text(e):
-        input_field_ref.current.value = ""
-        
-        # Reset stats
-        confidence_text_ref.current.value = "0%"
-        processing_time_ref.current.value = "0.00s"
-        word_count_ref.current.value = "0"
-        
-        # Reset bars
-        for category in categories:
-            category_bar_refs[category].current.width = 0
-            category_percentage_refs[category].current.value = "0%"
-            category_indicators[category].bgcolor = "#2a2640"  # Dark background
-            category_indicators[category].border = None
-        
-        # Reset prediction
-        prediction_text_ref.current.value = "Analysis will appear here"
-        prediction_icon_ref.current.name = icons.ANALYTICS_ROUNDED
-        prediction_display_ref.current.bgcolor = "#9a67ea"
-        
-        page.update()
+        ui.set(input_field_ref.current, value="")
+        reset_result_card()
+        ui.flush()
 
     # Responsive buttons refs
     buttons_row_ref = Ref[Row]()
@@ -818,6 +933,7 @@ def main(page: Page):
                             ],
                             spacing=10,
                         ),
+                        live_switch,
                     ],
                     alignment=MainAxisAlignment.SPACE_BETWEEN,
                 ),
@@ -936,6 +1052,63 @@ def main(page: Page):
         width=get_adaptive_width(),
     )
     
+    # Batch tab for classifying many articles at once
+    batch_card = build_batch_view(page, classifier, ui, category_colors, get_adaptive_width())
+    
+    # View switcher between the single-article and batch tabs
+    single_tab_ref = Ref[TextButton]()
+    batch_tab_ref = Ref[TextButton]()
+    
+    def tab_style(selected):
+        return ButtonStyle(
+            shape=RoundedRectangleBorder(radius=12),
+            bgcolor="#9a67ea" if selected else "#2a2640",
+            color="#e0e0f0",
+            padding=12,
+        )
+    
+    def show_view(batch):
+        ui.set(input_card, visible=not batch)
+        ui.set(result_container, visible=not batch)
+        ui.set(batch_card, visible=batch)
+        ui.set(single_tab_ref.current, style=tab_style(not batch))
+        ui.set(batch_tab_ref.current, style=tab_style(batch))
+        ui.flush()
+    
+    view_tabs = Container(
+        content=Row(
+            [
+                TextButton(
+                    ref=single_tab_ref,
+                    content=Row(
+                        [
+                            Icon(icons.ARTICLE_ROUNDED, color="#e0e0f0", size=18),
+                            Text("Single Article", size=14, color="#e0e0f0", font_family="Poppins-Medium")
+                        ],
+                        spacing=8,
+                    ),
+                    style=tab_style(True),
+                    on_click=lambda e: show_view(False),
+                ),
+                TextButton(
+                    ref=batch_tab_ref,
+                    content=Row(
+                        [
+                            Icon(icons.LIBRARY_BOOKS_ROUNDED, color="#e0e0f0", size=18),
+                            Text("Batch", size=14, color="#e0e0f0", font_family="Poppins-Medium")
+                        ],
+                        spacing=8,
+                    ),
+                    style=tab_style(False),
+                    on_click=lambda e: show_view(True),
+                ),
+            ],
+            spacing=10,
+            alignment=MainAxisAlignment.CENTER,
+        ),
+        margin=margin.only(bottom=15),
+    )
+    
     # Main column ref for updating
     main_column_ref = Ref[Column]()
     
@@ -944,8 +1117,10 @@ def main(page: Page):
         ref=main_column_ref,
         controls=[
             header,
+            view_tabs,
             input_card,
             result_container,
+            batch_card,
             footer
         ],
         horizontal_alignment=CrossAxisAlignment.CENTER,
@@ -966,22 +1141,23 @@ def main(page: Page):
             
             # Update component widths
             adaptive_width = get_adaptive_width()
-            header_ref.current.width = adaptive_width
-            input_card_ref.current.width = adaptive_width
-            result_container_ref.current.width = adaptive_width
-            footer_ref.current.width = adaptive_width
+            ui.set(header_ref.current, width=adaptive_width)
+            ui.set(input_card_ref.current, width=adaptive_width)
+            ui.set(result_container_ref.current, width=adaptive_width)
+            ui.set(footer_ref.current, width=adaptive_width)
+            ui.set(batch_card, width=adaptive_width)
             
             # Toggle button layouts
-            buttons_row_ref.current.visible = not is_mobile
-            buttons_col_ref.current.visible = is_mobile
+            ui.set(buttons_row_ref.current, visible=not is_mobile)
+            ui.set(buttons_col_ref.current, visible=is_mobile)
             
             # Toggle stats layouts
-            stats_row_ref.current.visible = not is_mobile
-            stats_col_ref.current.visible = is_mobile
+            ui.set(stats_row_ref.current, visible=not is_mobile)
+            ui.set(stats_col_ref.current, visible=is_mobile)
             
             # Toggle footer layouts
-            footer_row_ref.current.visible = not is_mobile
-            footer_col_ref.current.visible = is_mobile
+            ui.set(footer_row_ref.current, visible=not is_mobile)
+            ui.set(footer_col_ref.current, visible=is_mobile)
             
             # Update category bar sizes
             for category in categories:
@@ -991,9 +1167,9 @@ def main(page: Page):
                 
                 # Recalculate bar width
                 bar_scale = 1.5 if is_mobile else 3.0
-                category_bar_refs[category].current.width = percentage * bar_scale
+                ui.set(category_bar_refs[category].current, width=percentage * bar_scale)
             
-            page.update()
+            ui.flush()
     
     # Handle page resize event
     def page_resize(e):
@@ -1015,5 +1191,5 @@ def main(page: Page):
     # Initialize layout
     initialize_layout()
 
-# Run the app
-ft.app(target=main)
\ No newline at end of file
+# Run the app (uploads from web clients in the batch tab land in UPLOAD_DIR)
+ft.app(target=main, upload_dir=UPLOAD_DIR)
\ No newline at end of file
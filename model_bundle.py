@@ -0,0 +1,222 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import struct
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+# Single-file model bundle: the vectorizer and model travel together with a manifest.
+#
+# Layout: MAGIC | manifest length (8 bytes, big endian) | manifest JSON | pickled payload
+#
+# The whole file is read once. The manifest is parsed and the payload checksum verified
+# before anything is unpickled, then the unpickled pair is checked against the manifest
+# (feature dimension, classes, vocabulary and coefficient fingerprints) so a mismatched
+# vectorizer/model pair is rejected at load time instead of mispredicting later.
+
+MAGIC = b"NEWSBUNDLE\n"
+FORMAT_VERSION = 1
+# The shipped bundle, next to this module rather than the working directory
+DEFAULT_BUNDLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "news_classifier.bundle")
+
+
+class BundleError(ValueError):
+    pass
+
+
+def _sklearn_version():
+    try:
+        import sklearn
+        return sklearn.__version__
+    except ImportError:
+        return None
+
+
+def feature_dim(vectorizer):
+    return len(vectorizer.vocabulary_)
+
+
+def idf_weights(vectorizer):
+    # Per-feature idf, or ones when the vectorizer does not weight by idf
+    idf = getattr(vectorizer, "idf_", None) if getattr(vectorizer, "use_idf", True) else None
+    return np.asarray(idf, dtype=np.float64) if idf is not None else np.ones(feature_dim(vectorizer))
+
+
+def _model_feature_dim(model):
+    if hasattr(model, "coef_"):
+        return model.coef_.shape[1]
+    if hasattr(model, "feature_log_prob_"):
+        return model.feature_log_prob_.shape[1]
+    return getattr(model, "n_features_in_", None)
+
+
+def vocabulary_fingerprint(vectorizer):
+    # Hash of the term -> column mapping, independent of dict ordering
+    digest = hashlib.sha256()
+    for term, index in sorted(vectorizer.vocabulary_.items(), key=lambda item: item[1]):
+        digest.update(f"{index}\t{term}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def model_fingerprint(model):
+    digest = hashlib.sha256()
+    for name in ("coef_", "intercept_", "feature_log_prob_", "class_log_prior_"):
+        value = getattr(model, name, None)
+        if value is not None:
+            digest.update(name.encode("utf-8"))
+            digest.update(np.ascontiguousarray(value, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def check_compatible(vectorizer, model):
+    # Raise BundleError if the model was not trained on this vectorizer's feature space
+    if not hasattr(vectorizer, "vocabulary_"):
+        raise BundleError("Vectorizer is not fitted (no vocabulary_)")
+    if not hasattr(model, "classes_"):
+        raise BundleError("Model is not fitted (no classes_)")
+
+    vectorizer_dim = feature_dim(vectorizer)
+    model_dim = _model_feature_dim(model)
+    if model_dim is not None and model_dim != vectorizer_dim:
+        raise BundleError(
+            f"Vectorizer produces {vectorizer_dim} features but the model expects {model_dim}; "
+            "they were not trained together"
+        )
+
+
+def build_manifest(vectorizer, model, payload, metadata=None):
+    return {
+        "format": "news-classifier-bundle",
+        "format_version": FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "feature_dim": feature_dim(vectorizer),
+        "classes": [str(c) for c in model.classes_],
+        "vectorizer_class": type(vectorizer).__name__,
+        "model_class": type(model).__name__,
+        "sklearn_version": _sklearn_version(),
+        "vocabulary_sha256": vocabulary_fingerprint(vectorizer),
+        "model_sha256": model_fingerprint(model),
+        "payload_sha256": hashlib.sha256(payload).hexdigest(),
+        "payload_bytes": len(payload),
+        "training": metadata or {},
+    }
+
+
+def save_bundle(path, vectorizer, model, metadata=None):
+    check_compatible(vectorizer, model)
+    payload = pickle.dumps({"vectorizer": vectorizer, "model": model}, protocol=pickle.HIGHEST_PROTOCOL)
+    manifest = build_manifest(vectorizer, model, payload, metadata)
+    manifest_bytes = json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack(">Q", len(manifest_bytes)))
+        f.write(manifest_bytes)
+        f.write(payload)
+    return manifest
+
+
+def _split(data, path):
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise BundleError(f"{path} is not a model bundle")
+    header_end = len(MAGIC) + 8
+    (manifest_length,) = struct.unpack(">Q", data[len(MAGIC):header_end])
+    manifest_end = header_end + manifest_length
+    try:
+        manifest = json.loads(bytes(data[header_end:manifest_end]).decode("utf-8"))
+    except ValueError as exc:
+        raise BundleError(f"{path} has a corrupt manifest") from exc
+    return manifest, data[manifest_end:]
+
+
+def read_manifest(path):
+    with open(path, "rb") as f:
+        header = f.read(len(MAGIC) + 8)
+        if not header.startswith(MAGIC):
+            raise BundleError(f"{path} is not a model bundle")
+        (manifest_length,) = struct.unpack(">Q", header[len(MAGIC):])
+        return json.loads(f.read(manifest_length).decode("utf-8"))
+
+
+def load_bundle(path=DEFAULT_BUNDLE_PATH, expected_sha256=None):
+    # Returns (vectorizer, model, manifest). expected_sha256 optionally pins the whole file.
+    with open(path, "rb") as f:
+        data = memoryview(f.read())
+
+    if expected_sha256 is not None and hashlib.sha256(data).hexdigest() != expected_sha256:
+        raise BundleError(f"{path} does not match the expected checksum")
+
+    manifest, payload = _split(data, path)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise BundleError(
+            f"{path} uses bundle format {manifest.get('format_version')}, expected {FORMAT_VERSION}"
+        )
+    if len(payload) != manifest["payload_bytes"] or hashlib.sha256(payload).hexdigest() != manifest["payload_sha256"]:
+        raise BundleError(f"{path} payload is truncated or corrupted")
+
+    installed = _sklearn_version()
+    if manifest.get("sklearn_version") and installed and manifest["sklearn_version"] != installed:
+        warnings.warn(
+            f"{path} was built with scikit-learn {manifest['sklearn_version']}, running {installed}",
+            stacklevel=2,
+        )
+
+    contents = pickle.loads(payload)
+    vectorizer, model = contents["vectorizer"], contents["model"]
+
+    check_compatible(vectorizer, model)
+    if feature_dim(vectorizer) != manifest["feature_dim"]:
+        raise BundleError(f"{path}: vectorizer does not match the manifest feature dimension")
+    if [str(c) for c in model.classes_] != manifest["classes"]:
+        raise BundleError(f"{path}: model classes do not match the manifest")
+    if vocabulary_fingerprint(vectorizer) != manifest["vocabulary_sha256"]:
+        raise BundleError(f"{path}: vectorizer vocabulary does not match the manifest")
+    if model_fingerprint(model) != manifest["model_sha256"]:
+        raise BundleError(f"{path}: model weights do not match the manifest")
+
+    return vectorizer, model, manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect a news classifier model bundle.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Bundle a vectorizer and model into one validated file")
+    build.add_argument("vectorizer", help="Fitted TfidfVectorizer (.pkl)")
+    build.add_argument("model", help="Fitted classifier (.pkl)")
+    build.add_argument("output", nargs="?", default=DEFAULT_BUNDLE_PATH)
+    build.add_argument("--metadata", default=None, help="JSON object with training metadata")
+
+    inspect = commands.add_parser("inspect", help="Print a bundle's manifest")
+    inspect.add_argument("bundle", nargs="?", default=DEFAULT_BUNDLE_PATH)
+
+    verify = commands.add_parser("verify", help="Fully load and validate a bundle")
+    verify.add_argument("bundle", nargs="?", default=DEFAULT_BUNDLE_PATH)
+    verify.add_argument("--sha256", default=None, help="Expected sha256 of the whole bundle file")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        metadata = json.loads(args.metadata) if args.metadata else {}
+        metadata.setdefault("source_files", [args.vectorizer, args.model])
+        try:
+            manifest = save_bundle(args.output, joblib.load(args.vectorizer), joblib.load(args.model), metadata)
+        except BundleError as exc:
+            sys.exit(f"Refusing to bundle: {exc}")
+        print(f"Wrote {args.output}: {manifest['model_class']} over {manifest['feature_dim']} features, "
+              f"{len(manifest['classes'])} classes")
+    elif args.command == "inspect":
+        print(json.dumps(read_manifest(args.bundle), indent=2, sort_keys=True))
+    else:
+        start_time = time.time()
+        _, _, manifest = load_bundle(args.bundle, expected_sha256=args.sha256)
+        print(f"{args.bundle} OK ({manifest['model_class']}, loaded in {time.time() - start_time:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
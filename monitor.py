@@ -0,0 +1,246 @@
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+
+import numpy as np
+
+from classifier import add_model_arguments, classifier_from_args
+
+# Rolling-window production monitor: top-class confidence, predicted class mix, input
+# length and per-stage latency, kept as fixed-size histograms.
+#
+# The window is split into `slots` time slots, each holding one row of bin counts per
+# histogram. Observations go into the current slot; a slot is zeroed when time comes
+# back round to it, so memory never grows and old traffic ages out. Recording a batch
+# is a few searchsorted/bincount calls under one lock.
+#
+# Snapshots are JSON and can be appended to a local file; `python monitor.py reference`
+# builds the same snapshot for the training corpus and `python monitor.py compare`
+# reports the drift (population stability index) between the two.
+
+CONFIDENCE_EDGES = np.linspace(0.0, 1.0, 21)[1:-1]  # 20 bins of width 0.05
+LENGTH_EDGES = np.array([50, 100, 200, 400, 800, 1600, 3200, 6400, 12800, 25600], dtype=np.float64)  # characters
+LATENCY_EDGES_MS = np.geomspace(0.01, 10000.0, 31)
+OTHER_CLASS = "(other)"
+
+
+def _quantile(edges, counts, q):
+    # Upper edge of the bin holding the q-quantile; the open last bin reports its lower edge
+    total = counts.sum()
+    if not total:
+        return None
+    index = int(np.searchsorted(np.cumsum(counts), q * total))
+    return float(edges[min(index, len(edges) - 1)])
+
+
+def population_stability(observed, expected, epsilon=1e-4):
+    # PSI between two count vectors over the same bins; 0.1 is a small shift, 0.25 a large one
+    observed = np.asarray(observed, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    if not observed.sum() or not expected.sum():
+        return None
+    p = np.maximum(observed / observed.sum(), epsilon)
+    q = np.maximum(expected / expected.sum(), epsilon)
+    return float(np.sum((p - q) * np.log(p / q)))
+
+
+class _Histogram:
+    def __init__(self, edges, slots):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros((slots, len(self.edges) + 1), dtype=np.int64)
+
+    def add(self, slot, values):
+        bins = np.searchsorted(self.edges, values, side="right")
+        self.counts[slot] += np.bincount(bins, minlength=self.counts.shape[1])
+
+    def summary(self, rows, quantiles):
+        counts = self.counts[rows].sum(axis=0)
+        result = {"edges": self.edges.tolist(), "counts": counts.tolist(), "count": int(counts.sum())}
+        for name, q in quantiles:
+            result[name] = _quantile(self.edges, counts, q)
+        return result
+
+
+class ClassifierMonitor:
+    def __init__(self, classes, window_seconds=3600.0, slots=60, dump_path=None, dump_every=None):
+        self.classes = [str(c) for c in classes] + [OTHER_CLASS]
+        self._class_index = {c: i for i, c in enumerate(self.classes)}
+        self.window_seconds = window_seconds
+        self.slots = slots
+        self.slot_seconds = window_seconds / slots
+        self.dump_path = dump_path
+        self.dump_every = dump_every
+
+        self._slot_epochs = np.full(slots, -1, dtype=np.int64)
+        self.confidence = _Histogram(CONFIDENCE_EDGES, slots)
+        self.input_chars = _Histogram(LENGTH_EDGES, slots)
+        self.class_counts = np.zeros((slots, len(self.classes)), dtype=np.int64)
+        self.confidence_sums = np.zeros(slots)
+        self.latency = {}  # stage -> _Histogram of milliseconds
+        self.started = time.time()
+        self._last_dump = self.started
+        self._lock = threading.Lock()
+
+    def _epoch(self, now):
+        return int(now // self.slot_seconds) if math.isfinite(self.slot_seconds) else 0
+
+    def _slot(self, now):
+        # Current slot index, zeroing it first if it still holds counts from a past window
+        epoch = self._epoch(now)
+        slot = epoch % self.slots
+        if self._slot_epochs[slot] != epoch:
+            self._slot_epochs[slot] = epoch
+            self.confidence.counts[slot] = 0
+            self.input_chars.counts[slot] = 0
+            self.class_counts[slot] = 0
+            self.confidence_sums[slot] = 0.0
+            for histogram in self.latency.values():
+                histogram.counts[slot] = 0
+        return slot
+
+    def _live_rows(self, now):
+        epoch = self._epoch(now)
+        return (self._slot_epochs >= 0) & (self._slot_epochs > epoch - self.slots) & (self._slot_epochs <= epoch)
+
+    def observe(self, texts, results, now=None):
+        # One call per classified batch; results are classifier result dicts
+        if not results:
+            return
+        now = time.time() if now is None else now
+        confidences = np.fromiter((r["confidence"] for r in results), dtype=np.float64, count=len(results))
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.float64, count=len(texts))
+        other = self._class_index[OTHER_CLASS]
+        labels = [self._class_index.get(r["label"], other) for r in results]
+        with self._lock:
+            slot = self._slot(now)
+            self.confidence.add(slot, confidences)
+            self.input_chars.add(slot, lengths)
+            self.class_counts[slot] += np.bincount(labels, minlength=len(self.classes))
+            self.confidence_sums[slot] += confidences.sum()
+        self._maybe_dump(now)
+
+    def record_latency(self, stage, seconds, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            histogram = self.latency.get(stage)
+            if histogram is None:
+                histogram = self.latency[stage] = _Histogram(LATENCY_EDGES_MS, self.slots)
+            histogram.add(self._slot(now), [seconds * 1000.0])
+
+    def snapshot(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._live_rows(now)
+            articles = int(self.class_counts[rows].sum())
+            covered = min(self.window_seconds, now - self.started) if math.isfinite(self.window_seconds) else None
+            confidence = self.confidence.summary(rows, (("p10", 0.1), ("p50", 0.5)))
+            confidence["mean"] = float(self.confidence_sums[rows].sum() / articles) if articles else None
+            return {
+                "time": now,
+                "window_seconds": self.window_seconds if math.isfinite(self.window_seconds) else None,
+                "articles": articles,
+                "articles_per_second": articles / covered if covered else None,
+                "confidence": confidence,
+                "classes": dict(zip(self.classes, self.class_counts[rows].sum(axis=0).tolist())),
+                "input_chars": self.input_chars.summary(rows, (("p50", 0.5), ("p99", 0.99))),
+                "latency_ms": {
+                    stage: histogram.summary(rows, (("p50", 0.5), ("p99", 0.99)))
+                    for stage, histogram in self.latency.items()
+                },
+            }
+
+    def dump(self, path=None, now=None):
+        # Appends one snapshot as a JSON line
+        path = path or self.dump_path
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.snapshot(now)) + "\n")
+
+    def _maybe_dump(self, now):
+        if self.dump_path is None or self.dump_every is None:
+            return
+        with self._lock:
+            if now - self._last_dump < self.dump_every:
+                return
+            self._last_dump = now
+        self.dump(now=now)
+
+
+def compare(snapshot, reference):
+    # Drift of a production snapshot against a reference (e.g. training) snapshot
+    classes = sorted(set(snapshot["classes"]) | set(reference["classes"]))
+    observed = [snapshot["classes"].get(c, 0) for c in classes]
+    expected = [reference["classes"].get(c, 0) for c in classes]
+    observed_total, expected_total = max(sum(observed), 1), max(sum(expected), 1)
+    report = {
+        "articles": snapshot["articles"],
+        "confidence_psi": population_stability(snapshot["confidence"]["counts"], reference["confidence"]["counts"]),
+        "class_psi": population_stability(observed, expected),
+        "input_chars_psi": population_stability(snapshot["input_chars"]["counts"], reference["input_chars"]["counts"]),
+        "class_share_delta": {
+            c: o / observed_total - e / expected_total for c, o, e in zip(classes, observed, expected)
+        },
+    }
+    if snapshot["confidence"]["mean"] is not None and reference["confidence"]["mean"] is not None:
+        report["mean_confidence_delta"] = snapshot["confidence"]["mean"] - reference["confidence"]["mean"]
+    return report
+
+
+def reference_snapshot(classifier, texts, batch_size=1000):
+    # The monitor's view of a whole corpus, as one window
+    monitor = ClassifierMonitor(classifier.classes, window_seconds=math.inf, slots=1)
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        monitor.observe(batch, classifier.classify(batch), now=0.0)
+    return monitor.snapshot(now=0.0)
+
+
+def _read_last_snapshot(path):
+    last = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                last = line
+    if last is None:
+        raise ValueError(f"{path} has no snapshots")
+    return json.loads(last)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare monitor snapshots with the training distribution.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reference = commands.add_parser("reference", help="Build a reference snapshot from a corpus")
+    reference.add_argument("corpus", help="CSV or Parquet with headlines/description/content (or text)")
+    reference.add_argument("--output", default="training_reference.json")
+    add_model_arguments(reference)
+
+    check = commands.add_parser("compare", help="Drift of the latest snapshot in a dump file")
+    check.add_argument("snapshots", help="JSON lines file written by ClassifierMonitor.dump")
+    check.add_argument("reference", help="Reference snapshot from `monitor.py reference`")
+    check.add_argument("--fail-psi", type=float, default=None, help="Exit non-zero if any PSI exceeds this")
+
+    args = parser.parse_args()
+    if args.command == "reference":
+        from distill import load_corpus
+
+        texts, _ = load_corpus(args.corpus)
+        snapshot = reference_snapshot(classifier_from_args(args), texts)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2)
+        print(f"Wrote {args.output} ({snapshot['articles']} articles)", file=sys.stderr)
+        return
+
+    with open(args.reference, "r", encoding="utf-8") as f:
+        report = compare(_read_last_snapshot(args.snapshots), json.load(f))
+    print(json.dumps(report, indent=2))
+    if args.fail_psi is not None:
+        drifted = [k for k, v in report.items() if k.endswith("_psi") and v is not None and v > args.fail_psi]
+        if drifted:
+            sys.exit(f"Drift above PSI {args.fail_psi}: {', '.join(drifted)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import hashlib
+import re
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+# Tokenizer used for fingerprinting (kept close to TfidfVectorizer's default token pattern)
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+FINGERPRINT_BITS = 64
+PROJECTION_SEED = 0x5EED
+
+
+def _hash_feature(feature):
+    # Stable 64-bit hash, independent of PYTHONHASHSEED
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _pack_bits(weights):
+    # One 64-bit fingerprint per row of a (rows, 64) weight matrix: bit b is set when weight b > 0
+    packed = np.packbits(weights > 0, axis=1, bitorder="little")
+    return packed.view("<u8")[:, 0].tolist()
+
+
+def simhash(text, shingle_size=3):
+    # 64-bit SimHash over word shingles, weighted by how often each shingle occurs
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if len(tokens) < shingle_size:
+        features = Counter(tokens)
+    else:
+        features = Counter(
+            " ".join(tokens[i:i + shingle_size])
+            for i in range(len(tokens) - shingle_size + 1)
+        )
+    if not features:
+        return 0
+
+    hashes = np.fromiter((_hash_feature(f) for f in features), dtype="<u8", count=len(features))
+    counts = np.fromiter(features.values(), dtype=np.int64, count=len(features))
+    # Row i holds the 64 bits of hash i, lowest bit first; each bit adds +count or -count
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    weights = counts @ (2 * bits.astype(np.int64) - 1)
+    return _pack_bits(weights[None, :])[0]
+
+
+_projections = {}
+
+
+def _projection(n_features):
+    # Fixed random +/-1 hyperplanes, one column per fingerprint bit
+    projection = _projections.get(n_features)
+    if projection is None:
+        rng = np.random.default_rng(PROJECTION_SEED)
+        projection = rng.choice(np.array([-1.0, 1.0], dtype=np.float32), size=(n_features, FINGERPRINT_BITS))
+        _projections[n_features] = projection
+    return projection
+
+
+def feature_simhash(features):
+    # SimHash of each row of a sparse feature matrix (e.g. TF-IDF), as one matrix product.
+    # Features are vocabulary terms rather than shingles, so word order is ignored, but
+    # the matrix is the one the classifier scores anyway.
+    if features.shape[0] == 0:
+        return []
+    return _pack_bits(np.asarray(features @ _projection(features.shape[1])))
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateIndex:
+    # Bounded SimHash index that remembers the result of recently classified articles.
+    #
+    # similarity is 1 - hamming_distance / 64, so the default of 0.95 accepts up to
+    # 3 differing bits. Fingerprints are split into (max_distance + 1) bands; by the
+    # pigeonhole principle any fingerprint within max_distance bits of another shares
+    # at least one band with it exactly, so lookups only compare against those candidates.
+    # Memory is capped at max_entries, evicting the least recently used article.
+
+    def __init__(self, similarity_threshold=0.95, max_entries=50000, shingle_size=3):
+        if not 0.0 < similarity_threshold <= 1.0:
+            raise ValueError("similarity_threshold must be in (0, 1]")
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.shingle_size = shingle_size
+        self.max_distance = int((1.0 - similarity_threshold) * FINGERPRINT_BITS)
+
+        num_bands = min(self.max_distance + 1, FINGERPRINT_BITS)
+        band_width = FINGERPRINT_BITS // num_bands
+        self._bands = []
+        for i in range(num_bands):
+            start = i * band_width
+            # Last band absorbs the remainder bits
+            width = FINGERPRINT_BITS - start if i == num_bands - 1 else band_width
+            self._bands.append((start, (1 << width) - 1))
+
+        self._entries = OrderedDict()  # fingerprint -> stored result
+        self._buckets = [{} for _ in self._bands]  # band value -> set of fingerprints
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def fingerprint(self, text):
+        return simhash(text, self.shingle_size)
+
+    def fingerprint_features(self, features):
+        return feature_simhash(features)
+
+    def _band_keys(self, fingerprint):
+        return [(fingerprint >> start) & mask for start, mask in self._bands]
+
+    def lookup(self, text=None, fingerprint=None):
+        # Return (stored result, similarity) of the closest stored article, or None
+        if fingerprint is None:
+            fingerprint = self.fingerprint(text)
+
+        best = None
+        best_distance = self.max_distance + 1
+        for bucket, key in zip(self._buckets, self._band_keys(fingerprint)):
+            for candidate in bucket.get(key, ()):
+                distance = hamming_distance(fingerprint, candidate)
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+
+        if best is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(best)
+        return self._entries[best], 1.0 - best_distance / FINGERPRINT_BITS
+
+    def add(self, value, text=None, fingerprint=None):
+        if fingerprint is None:
+            fingerprint = self.fingerprint(text)
+
+        if fingerprint in self._entries:
+            self._entries[fingerprint] = value
+            self._entries.move_to_end(fingerprint)
+            return
+
+        self._entries[fingerprint] = value
+        for bucket, key in zip(self._buckets, self._band_keys(fingerprint)):
+            bucket.setdefault(key, set()).add(fingerprint)
+
+        while len(self._entries) > self.max_entries:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        fingerprint, _ = self._entries.popitem(last=False)
+        for bucket, key in zip(self._buckets, self._band_keys(fingerprint)):
+            members = bucket.get(key)
+            if members is not None:
+                members.discard(fingerprint)
+                if not members:
+                    del bucket[key]
+
+    def clear(self):
+        self._entries.clear()
+        for bucket in self._buckets:
+            bucket.clear()
+        self.hits = 0
+        self.misses = 0
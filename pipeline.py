@@ -0,0 +1,409 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from classifier import ClassifierRouter, add_model_arguments, article_text, classifier_from_args
+from monitor import ClassifierMonitor
+from near_duplicates import NearDuplicateIndex
+from transformer_backend import TransformerClassifier, add_transformer_arguments
+
+# Marker passed down the queues once a stage has no more input
+_STOP = object()
+
+
+def parse_line(line, offset):
+    # JSON objects are used as-is; anything else is treated as raw article text
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        record = None
+    if not isinstance(record, dict):
+        record = {"text": line}
+    record.setdefault("id", offset)
+    return record
+
+
+async def _line_source(open_stream, buffered_lines=256):
+    # Blocking reads happen on a daemon thread feeding a bounded queue, so other stages keep
+    # running and a stop request never has to wait for readline on an idle pipe or FIFO.
+    # The thread owns the stream: closing it from the event loop would block on the
+    # reader's buffer lock until the pending readline returned.
+    loop = asyncio.get_running_loop()
+    lines = asyncio.Queue(maxsize=buffered_lines)
+
+    def read_lines():
+        try:
+            with open_stream() as stream:
+                for line in iter(stream.readline, ""):
+                    asyncio.run_coroutine_threadsafe(lines.put(line), loop).result()
+            item = _STOP
+        except Exception as exc:
+            item = exc
+        try:
+            asyncio.run_coroutine_threadsafe(lines.put(item), loop)
+        except RuntimeError:
+            pass  # The event loop is already gone
+
+    threading.Thread(target=read_lines, name="pipeline-reader", daemon=True).start()
+    offset = 0
+    while True:
+        line = await lines.get()
+        if line is _STOP:
+            return
+        if isinstance(line, Exception):
+            raise line
+        record = parse_line(line, offset)
+        offset += 1
+        if record is not None:
+            yield record
+
+
+async def file_source(path):
+    async for record in _line_source(lambda: open(path, "r", encoding="utf-8")):
+        yield record
+
+
+async def stdin_source():
+    # stdin is left open when the source finishes
+    async for record in _line_source(lambda: contextlib.nullcontext(sys.stdin)):
+        yield record
+
+
+class JsonLinesSink:
+    # Writes one JSON object per classified record to a file or stdout
+
+    def __init__(self, path=None):
+        self.path = path
+        self._stream = open(path, "w", encoding="utf-8") if path else sys.stdout
+
+    def _write_batch(self, records):
+        self._stream.write("".join(json.dumps(r) + "\n" for r in records))
+        self._stream.flush()
+
+    async def write(self, records):
+        await asyncio.to_thread(self._write_batch, records)
+
+    async def close(self):
+        if self.path:
+            self._stream.close()
+
+
+def format_result(record, result):
+    output = {"id": record.get("id"), "label": result["label"], "confidence": result["confidence"]}
+    if "top" in result:
+        output["top"] = result["top"]
+    else:
+        output["probabilities"] = result["probabilities"].tolist()
+    if "backend" in result:
+        output["backend"] = result["backend"]
+    if "explanation" in result:
+        output["explanation"] = result["explanation"]
+    if result["duplicate_of_similarity"] is not None:
+        output["duplicate_of_similarity"] = result["duplicate_of_similarity"]
+    return output
+
+
+class ClassificationPipeline:
+    # source -> batcher -> classifier workers -> sink, connected by bounded queues.
+    #
+    # Every queue has a fixed size, so a slow sink or classifier makes the upstream
+    # stages wait on put() instead of buffering the whole feed in memory. stop()
+    # stops pulling from the source; everything already read is still classified
+    # and written before run() returns. With a ClassifierMonitor, the time batches wait
+    # for a worker ("queue") and for the sink ("write") are recorded as stage latencies.
+    # A batch that fails to classify is written as one {"id", "error"} line per record;
+    # if a stage itself fails, the others are cancelled before the sink is closed.
+
+    def __init__(self, classifier, batch_size=64, max_batch_delay=0.05, concurrency=2,
+                 queue_size=1024, top_k=None, min_probability=None, explain_top_n=None, monitor=None):
+        if batch_size < 1 or concurrency < 1 or queue_size < 1:
+            raise ValueError("batch_size, concurrency and queue_size must be at least 1")
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be at least 1")
+        if min_probability is not None and not 0.0 <= min_probability <= 1.0:
+            raise ValueError("min_probability must be between 0 and 1")
+        if explain_top_n is not None and explain_top_n < 0:
+            raise ValueError("explain_top_n must be at least 0")
+        if explain_top_n is not None and not isinstance(classifier, ClassifierRouter) and not classifier.explains():
+            raise ValueError(f"{type(classifier).__name__} cannot explain predictions with this model")
+
+        self.classifier = classifier
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.top_k = top_k
+        self.min_probability = min_probability
+        self.explain_top_n = explain_top_n
+        self.monitor = monitor
+
+        self._stopping = None
+        self.records_in = 0
+        self.records_out = 0
+        self.batches = 0
+        self.failed_batches = 0
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def _read(self, source, records):
+        # Each read races the stop event, so stop() takes effect even while the source is idle
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        iterator = source.__aiter__()
+        try:
+            while True:
+                next_record = asyncio.ensure_future(iterator.__anext__())
+                await asyncio.wait({next_record, stopping}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_record.done():
+                    next_record.cancel()
+                    break
+                try:
+                    record = next_record.result()
+                except StopAsyncIteration:
+                    break
+                await records.put(record)
+                self.records_in += 1
+        finally:
+            stopping.cancel()
+        await records.put(_STOP)
+
+    async def _batch(self, records, batches):
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            record = await records.get()
+            if record is _STOP:
+                break
+
+            batch = [record]
+            deadline = loop.time() + self.max_batch_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                # asyncio.wait rather than wait_for, which can swallow a cancellation that
+                # arrives as the get completes and leave this stage running after a failure
+                getter = asyncio.ensure_future(records.get())
+                try:
+                    await asyncio.wait({getter}, timeout=timeout)
+                finally:
+                    timed_out = not getter.done()
+                    if timed_out:
+                        getter.cancel()
+                if timed_out:
+                    break
+                record = getter.result()
+                if record is _STOP:
+                    done = True
+                    break
+                batch.append(record)
+
+            await batches.put((loop.time(), batch))
+
+        for _ in range(self.concurrency):
+            await batches.put(_STOP)
+
+    def _classify_batch(self, batch):
+        texts = [article_text(record) for record in batch]
+        options = {"top_k": self.top_k, "min_probability": self.min_probability, "explain_top_n": self.explain_top_n}
+        if not isinstance(self.classifier, ClassifierRouter):
+            results = self.classifier.classify(texts, **options)
+            return [format_result(record, result) for record, result in zip(batch, results)]
+
+        # Records may pick a backend with a "backend" field; each backend sees one call per batch.
+        # An unknown backend fails only its own record, with an error line in the output.
+        valid = set(self.classifier.backends) | {"auto", None}
+        groups = {}
+        outputs = [None] * len(batch)
+        for i, record in enumerate(batch):
+            backend = record.get("backend")
+            if backend is None or (isinstance(backend, str) and backend in valid):
+                groups.setdefault(backend, []).append(i)
+            else:
+                outputs[i] = {
+                    "id": record.get("id"),
+                    "error": f"Unknown backend {backend!r}; available: {', '.join(self.classifier.backends)}, auto",
+                }
+        for backend, rows in groups.items():
+            results = self.classifier.classify([texts[i] for i in rows], backend=backend, **options)
+            for i, result in zip(rows, results):
+                outputs[i] = format_result(batch[i], result)
+        return outputs
+
+    async def _work(self, batches, outputs, executor):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await batches.get()
+            if item is _STOP:
+                await outputs.put(_STOP)
+                return
+            queued_at, batch = item
+            if self.monitor is not None:
+                self.monitor.record_latency("queue", loop.time() - queued_at)
+            try:
+                results = await loop.run_in_executor(executor, self._classify_batch, batch)
+            except Exception as exc:
+                # One bad batch must not stop the feed; its records get error lines instead
+                self.failed_batches += 1
+                error = f"{type(exc).__name__}: {exc}"
+                results = [{"id": record.get("id"), "error": error} for record in batch]
+            await outputs.put(results)
+            self.batches += 1
+
+    async def _write(self, outputs, sink):
+        remaining = self.concurrency
+        while remaining:
+            results = await outputs.get()
+            if results is _STOP:
+                remaining -= 1
+                continue
+            write_start = time.perf_counter()
+            await sink.write(results)
+            if self.monitor is not None:
+                self.monitor.record_latency("write", time.perf_counter() - write_start)
+            self.records_out += len(results)
+
+    async def run(self, source, sink):
+        self._stopping = asyncio.Event()
+        records = asyncio.Queue(maxsize=self.queue_size)
+        batches = asyncio.Queue(maxsize=self.concurrency * 2)
+        outputs = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            stages = [
+                asyncio.ensure_future(stage) for stage in (
+                    self._read(source, records),
+                    self._batch(records, batches),
+                    *(self._work(batches, outputs, executor) for _ in range(self.concurrency)),
+                    self._write(outputs, sink),
+                )
+            ]
+            try:
+                await asyncio.gather(*stages)
+            except BaseException:
+                # Nothing may keep writing to the sink once it is closed
+                for stage in stages:
+                    stage.cancel()
+                await asyncio.gather(*stages, return_exceptions=True)
+                raise
+            finally:
+                await sink.close()
+
+
+async def _run_cli(args):
+    # Transformer predictions carry no term contributions
+    if args.backend == "transformer" and args.explain is not None:
+        sys.exit("--explain is not available with --backend transformer")
+    dedup_index = NearDuplicateIndex(similarity_threshold=args.dedup_similarity) if args.dedup else None
+    classifier = classifier_from_args(args, dedup_index=dedup_index)
+    monitor = None
+    if args.monitor:
+        monitor = ClassifierMonitor(classifier.classes, window_seconds=args.monitor_window,
+                                    dump_path=args.monitor, dump_every=args.monitor_every)
+        classifier.monitor = monitor
+    if args.transformer:
+        transformer = TransformerClassifier(
+            args.transformer,
+            max_length=args.max_length,
+            max_batch_tokens=args.max_batch_tokens,
+            max_batch_size=args.max_batch_size,
+            num_threads=args.threads,
+            label_map=json.loads(args.transformer_label_map) if args.transformer_label_map else None,
+            dedup_index=NearDuplicateIndex(similarity_threshold=args.dedup_similarity) if args.dedup else None,
+            monitor=monitor,
+        )
+        try:
+            classifier = ClassifierRouter(
+                {"linear": classifier, "transformer": transformer},
+                default=args.backend,
+                fallback="transformer",
+                uncertainty_threshold=args.uncertainty_threshold,
+                monitor=monitor,
+            )
+        except ValueError as exc:
+            sys.exit(str(exc))
+    elif args.backend != "linear":
+        sys.exit(f"--backend {args.backend} needs --transformer")
+    try:
+        pipeline = ClassificationPipeline(
+            classifier,
+            batch_size=args.batch_size,
+            max_batch_delay=args.max_batch_delay,
+            concurrency=args.concurrency,
+            queue_size=args.queue_size,
+            top_k=args.top_k,
+            min_probability=args.min_probability,
+            explain_top_n=args.explain,
+            monitor=monitor,
+        )
+    except ValueError as exc:
+        sys.exit(str(exc))
+
+    # Ctrl+C / SIGTERM drain in-flight work instead of dropping it
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, pipeline.stop)
+        except NotImplementedError:
+            pass
+
+    source = file_source(args.input) if args.input and args.input != "-" else stdin_source()
+    sink = JsonLinesSink(args.output if args.output and args.output != "-" else None)
+
+    start_time = time.time()
+    await pipeline.run(source, sink)
+    elapsed = time.time() - start_time
+    if monitor is not None:
+        monitor.dump()
+    print(
+        f"Classified {pipeline.records_out} articles in {pipeline.batches} batches "
+        f"({elapsed:.2f}s, {pipeline.records_out / max(elapsed, 1e-9):.1f} articles/s)"
+        f"{f'; {pipeline.failed_batches} batches failed (error lines written)' if pipeline.failed_batches else ''}",
+        file=sys.stderr,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify a stream of news articles (JSON lines or plain text).")
+    parser.add_argument("--input", default="-", help="Input file, or - for stdin")
+    parser.add_argument("--output", default="-", help="Output JSON lines file, or - for stdout")
+    add_model_arguments(parser)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-batch-delay", type=float, default=0.05, help="Seconds to wait to fill a batch")
+    parser.add_argument("--concurrency", type=int, default=2, help="Number of classifier workers")
+    parser.add_argument("--queue-size", type=int, default=1024)
+    parser.add_argument("--top-k", type=int, default=None)
+    parser.add_argument("--min-probability", type=float, default=None)
+    parser.add_argument("--explain", type=int, default=None, metavar="N",
+                        help="Include the N terms that contributed most to each prediction")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Reuse results for near-duplicate articles (off by default: it rarely saves time)")
+    parser.add_argument("--dedup-similarity", type=float, default=0.95)
+    parser.add_argument("--transformer", default=None, metavar="DIR",
+                        help="Transformer checkpoint or exported ONNX directory (see transformer_backend.py)")
+    parser.add_argument("--transformer-label-map", default=None, metavar="JSON",
+                        help="JSON object mapping transformer labels to the linear model's categories")
+    parser.add_argument("--backend", choices=("linear", "transformer", "auto"), default="linear",
+                        help="Default backend; records can override it with a \"backend\" field")
+    parser.add_argument("--uncertainty-threshold", type=float, default=0.6,
+                        help="auto: re-score linear predictions below this confidence with the transformer")
+    add_transformer_arguments(parser)
+    parser.add_argument("--monitor", default=None, metavar="FILE",
+                        help="Append rolling monitor snapshots (JSON lines) to FILE; see monitor.py")
+    parser.add_argument("--monitor-every", type=float, default=60.0, help="Seconds between snapshots")
+    parser.add_argument("--monitor-window", type=float, default=3600.0, help="Rolling window in seconds")
+    asyncio.run(_run_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
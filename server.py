@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from classifier import add_model_arguments, classifier_from_args
+from monitor import ClassifierMonitor
+from near_duplicates import NearDuplicateIndex
+
+# Minimal local HTTP front end for the classifier (standard library only), used by
+# loadtest.py and for trying the engine from other processes.
+#
+#   POST /classify  {"texts": [...]} or {"text": "..."}, optional "top_k",
+#                   "min_probability" and "explain" -> {"results": [...]}
+#   GET  /health    {"status": "ok", "rss_mb": ...}
+#   GET  /monitor   latest ClassifierMonitor snapshot
+
+
+def rss_mb(pid="self"):
+    # Resident set size from /proc; None where it is not available
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _json_result(result):
+    output = {k: v for k, v in result.items() if k != "probabilities"}
+    if "probabilities" in result:
+        output["probabilities"] = result["probabilities"].tolist()
+    return output
+
+
+class ClassifierHandler(BaseHTTPRequestHandler):
+    classifier = None
+    quiet = True
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "rss_mb": rss_mb()})
+        elif self.path == "/monitor" and self.classifier.monitor is not None:
+            self._send(200, self.classifier.monitor.snapshot())
+        else:
+            self._send(404, {"error": f"no route {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/classify":
+            self._send(404, {"error": f"no route {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            texts = request["texts"] if "texts" in request else [request["text"]]
+            results = self.classifier.classify(
+                [str(t) for t in texts],
+                top_k=request.get("top_k"),
+                min_probability=request.get("min_probability"),
+                explain_top_n=request.get("explain"),
+            )
+        except (KeyError, TypeError, ValueError) as exc:
+            self._send(400, {"error": str(exc)})
+            return
+        self._send(200, {"results": [_json_result(r) for r in results]})
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(classifier, host="127.0.0.1", port=8000, quiet=True):
+    handler = type("Handler", (ClassifierHandler,), {"classifier": classifier, "quiet": quiet})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the news classifier over local HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_model_arguments(parser)
+    parser.add_argument("--dedup", action="store_true", help="Reuse results for near-duplicate articles")
+    parser.add_argument("--monitor", default=None, metavar="FILE", help="Append monitor snapshots to FILE")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    dedup_index = NearDuplicateIndex() if args.dedup else None
+    classifier = classifier_from_args(args, dedup_index=dedup_index)
+    classifier.monitor = ClassifierMonitor(classifier.classes, dump_path=args.monitor, dump_every=60.0)
+    server = make_server(classifier, args.host, args.port, quiet=not args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.monitor:
+            classifier.monitor.dump()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+import checkpoint
+from classifier import load_classifier
+from incremental import IncrementalScorer
+from model_bundle import DEFAULT_BUNDLE_PATH
+from near_duplicates import FINGERPRINT_BITS, NearDuplicateIndex, hamming_distance
+
+# Checks against the shipped news_classifier.bundle: run with python -m pytest -q
+
+ARTICLES = [
+    "Apple unveiled its new iPhone with a faster chip and a better camera at its annual launch event.",
+    "The central bank raised interest rates again as inflation stayed above target and markets fell.",
+    "The home side scored twice in extra time to win the cup final in front of a record crowd.",
+    "Health officials urged parents to vaccinate children ahead of the winter flu season.",
+    "The ministry announced new exam rules for universities and schools starting next year.",
+]
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return load_classifier()
+
+
+def _flip(fingerprint, bits):
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+@pytest.mark.parametrize("similarity_threshold", [0.95, 0.9, 0.8])
+def test_banded_lookup_finds_every_fingerprint_within_max_distance(similarity_threshold):
+    rng = random.Random(7)
+    index = NearDuplicateIndex(similarity_threshold=similarity_threshold)
+    stored = [rng.getrandbits(FINGERPRINT_BITS) for _ in range(200)]
+    for i, fingerprint in enumerate(stored):
+        index.add(i, fingerprint=fingerprint)
+
+    for i, fingerprint in enumerate(stored):
+        distance = rng.randint(0, index.max_distance)
+        probe = _flip(fingerprint, rng.sample(range(FINGERPRINT_BITS), distance))
+        match = index.lookup(fingerprint=probe)
+        assert match is not None
+        # The closest stored fingerprint wins: the original, or one at least as near
+        value, similarity = match
+        assert similarity >= 1.0 - distance / FINGERPRINT_BITS
+        assert value == i or hamming_distance(probe, stored[value]) <= distance
+
+
+def test_banded_lookup_rejects_fingerprints_beyond_max_distance():
+    index = NearDuplicateIndex(similarity_threshold=0.95)
+    fingerprint = random.Random(3).getrandbits(FINGERPRINT_BITS)
+    index.add("stored", fingerprint=fingerprint)
+    assert index.lookup(fingerprint=_flip(fingerprint, range(index.max_distance + 1))) is None
+
+
+def test_classify_collapses_copies_within_one_batch(classifier):
+    classifier.dedup_index = NearDuplicateIndex()
+    try:
+        results = classifier.classify([ARTICLES[0], ARTICLES[1], ARTICLES[0]])
+    finally:
+        classifier.dedup_index = None
+    assert results[0]["duplicate_of_similarity"] is None
+    assert results[2]["duplicate_of_similarity"] == 1.0
+    assert results[2]["label"] == results[0]["label"]
+    np.testing.assert_array_equal(results[2]["probabilities"], results[0]["probabilities"])
+
+
+def _edits(text):
+    # Typing, a middle deletion, a word replacement, punctuation and case changes, then clearing
+    yield text[:1]
+    for end in range(10, len(text) + 1, 17):
+        yield text[:end]
+    yield text
+    yield text[:20] + text[45:]
+    yield text.replace("new", "old", 1)
+    yield text.upper() + " Extra, extra!!"
+    yield text + " " + ARTICLES[1]
+    yield ""
+    yield ARTICLES[2]
+
+
+def test_incremental_scores_match_full_transform(classifier):
+    scorer = IncrementalScorer(classifier.vectorizer, classifier.model)
+    assert scorer.incremental
+    for text in _edits(ARTICLES[0]):
+        expected = classifier.model.predict_proba(classifier.vectorizer.transform([text]))[0]
+        np.testing.assert_allclose(scorer.update(text), expected, rtol=0, atol=1e-12)
+
+
+def test_incremental_resync_keeps_scores(classifier):
+    scorer = IncrementalScorer(classifier.vectorizer, classifier.model, resync_every=3)
+    for text in _edits(ARTICLES[3]):
+        probabilities = scorer.update(text)
+    expected = classifier.model.predict_proba(classifier.vectorizer.transform([ARTICLES[2]]))[0]
+    np.testing.assert_allclose(probabilities, expected, rtol=0, atol=1e-12)
+
+
+def _checkpoint_options(**overrides):
+    options = dict(bundle=DEFAULT_BUNDLE_PATH, vectorizer=None, model=None, bundle_sha256=None,
+                   batch_size=2, text_columns=["headlines", "content"], id_column="id",
+                   top_k=None, min_probability=None)
+    options.update(overrides)
+    return options
+
+
+def test_checkpoint_resume_is_idempotent(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    input_path = str(tmp_path / "articles.parquet")
+    schema = pa.schema([("id", pa.int64()), ("headlines", pa.string()), ("content", pa.string())])
+    with pq.ParquetWriter(input_path, schema) as writer:
+        for group in ([0, 1, 2], [], [3, 4], [0, 2]):
+            writer.write_table(pa.table({
+                "id": [100 + i for i in group],
+                "headlines": [ARTICLES[i][:40] for i in group],
+                "content": [ARTICLES[i] for i in group],
+            }, schema=schema))
+
+    output_dir = str(tmp_path / "predictions")
+    assert checkpoint.run(input_path, output_dir, num_workers=2, **_checkpoint_options()) == 7
+    shards = sorted(f for f in os.listdir(output_dir) if f.startswith("part-"))
+    # The empty row group still gets its (empty) shard
+    assert shards == [f"part-{i:05d}.parquet" for i in range(4)]
+    first = pq.read_table(output_dir).sort_by("row")
+
+    # Nothing left to do, then a lost shard (crash before it reached disk) is redone alone
+    assert checkpoint.run(input_path, output_dir, num_workers=2, **_checkpoint_options()) == 0
+    os.remove(os.path.join(output_dir, shards[2]))
+    assert checkpoint.run(input_path, output_dir, num_workers=2, **_checkpoint_options()) == 2
+
+    # A shard cut short by a host crash is not taken as done either
+    with open(os.path.join(output_dir, shards[0]), "r+b") as f:
+        f.truncate(16)
+    assert checkpoint.run(input_path, output_dir, num_workers=2, **_checkpoint_options()) == 3
+
+    second = pq.read_table(output_dir).sort_by("row")
+    assert second.equals(first)
+    assert second.column("row").to_pylist() == list(range(7))
+    assert second.column("id").to_pylist() == [100, 101, 102, 103, 104, 100, 102]
+
+    # Different output-affecting options, or a rewritten input, never reuse the checkpoint
+    with pytest.raises(ValueError):
+        checkpoint.run(input_path, output_dir, num_workers=2, **_checkpoint_options(top_k=2))
+    stat = os.stat(input_path)
+    os.utime(input_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    with pytest.raises(ValueError):
+        checkpoint.run(input_path, output_dir, num_workers=2, **_checkpoint_options())
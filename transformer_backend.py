@@ -0,0 +1,235 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from classifier import BaseClassifier, softmax
+
+# CPU inference for a fine-tuned transformer sequence classifier, behind the same
+# classify()/score() API as NewsClassifier so the two can be routed per request
+# (see classifier.ClassifierRouter).
+#
+# Articles are tokenized once without padding, truncated to max_length, sorted by
+# length and cut into batches that fit a max_batch_tokens budget (padded length times
+# batch size). Each batch is padded only to its own longest article, so short articles
+# are not padded out to the longest one in the request.
+#
+# A checkpoint directory exported with `python transformer_backend.py export` holds
+# model_quantized.onnx (int8 dynamic quantization) and/or model.onnx next to the
+# tokenizer and config; those run on onnxruntime. Anything else loads with torch,
+# optionally with torch's dynamic int8 quantization of the Linear layers.
+
+ONNX_FILES = ("model_quantized.onnx", "model.onnx")
+MODEL_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def _require(*modules):
+    try:
+        return [__import__(m, fromlist=["_"]) for m in modules]
+    except ImportError as exc:
+        raise ImportError(
+            f"The transformer backend requires {', '.join(modules)}: pip install {' '.join(modules)}"
+        ) from exc
+
+
+def length_buckets(lengths, max_batch_tokens=8192, max_batch_size=64):
+    # Lists of row indices, shortest articles first, each within the padded-token budget
+    order = np.argsort(lengths, kind="stable")
+    batches, current = [], []
+    for i in order:
+        # Sorted ascending, so the article being added is the longest in the batch
+        if current and (len(current) >= max_batch_size
+                        or (len(current) + 1) * lengths[i] > max_batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(int(i))
+    if current:
+        batches.append(current)
+    return batches
+
+
+def find_onnx_model(path):
+    for name in ONNX_FILES:
+        candidate = os.path.join(path, name)
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+class TransformerClassifier(BaseClassifier):
+    # Sequence classifier from a local checkpoint directory, run on CPU
+
+    name = "transformer"
+
+    def __init__(self, path, max_length=256, max_batch_tokens=8192, max_batch_size=64, num_threads=None,
+                 use_onnx=None, quantize=False, label_map=None, dedup_index=None, monitor=None):
+        (transformers,) = _require("transformers")
+        self.path = path
+        self.max_length = max_length
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(path, local_files_only=True)
+
+        onnx_path = find_onnx_model(path) if use_onnx is not False else None
+        if use_onnx and onnx_path is None:
+            raise ValueError(f"No {' or '.join(ONNX_FILES)} in {path}; run `python transformer_backend.py export`")
+
+        if onnx_path is not None:
+            (ort,) = _require("onnxruntime")
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if num_threads:
+                options.intra_op_num_threads = num_threads
+            # Batches run one at a time; parallelism comes from inside each operator
+            options.inter_op_num_threads = 1
+            self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+            self.input_names = [i.name for i in self.session.get_inputs()]
+            self.model = None
+            self.runtime = "onnxruntime-int8" if os.path.basename(onnx_path) == ONNX_FILES[0] else "onnxruntime"
+            config = transformers.AutoConfig.from_pretrained(path, local_files_only=True)
+        else:
+            (torch,) = _require("torch")
+            if num_threads:
+                torch.set_num_threads(num_threads)
+            self._torch = torch
+            self.model = transformers.AutoModelForSequenceClassification.from_pretrained(path, local_files_only=True)
+            self.model.eval()
+            if quantize:
+                self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.session = None
+            self.input_names = [n for n in self.tokenizer.model_input_names if n in MODEL_INPUTS]
+            self.runtime = "torch-int8" if quantize else "torch"
+            config = self.model.config
+
+        id2label = config.id2label
+        labels = [str(id2label[i]).lower() for i in range(len(id2label))]
+        if label_map:
+            labels = [label_map.get(label, label).lower() for label in labels]
+        super().__init__(labels, dedup_index=dedup_index, monitor=monitor)
+
+    def _run(self, batch):
+        if self.session is not None:
+            feeds = {name: batch[name].astype(np.int64) for name in self.input_names if name in batch}
+            return np.asarray(self.session.run(None, feeds)[0], dtype=np.float64)
+        with self._torch.inference_mode():
+            inputs = {name: self._torch.from_numpy(batch[name].astype(np.int64))
+                      for name in self.input_names if name in batch}
+            return self.model(**inputs).logits.double().numpy()
+
+    def logits(self, texts):
+        if not texts:
+            return np.zeros((0, len(self.classes)))
+        # One tokenizer pass over the whole request, unpadded
+        encoded = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+        columns = [name for name in self.input_names if name in encoded]
+        lengths = np.fromiter((len(ids) for ids in encoded["input_ids"]), dtype=np.int64, count=len(texts))
+
+        logits = np.empty((len(texts), len(self.classes)))
+        for rows in length_buckets(lengths, self.max_batch_tokens, self.max_batch_size):
+            batch = self.tokenizer.pad(
+                {name: [encoded[name][i] for i in rows] for name in columns},
+                return_tensors="np",
+            )
+            logits[rows] = self._run(batch)
+        return logits
+
+    def score(self, texts):
+        return softmax(self.logits(texts))
+
+
+def export_onnx(checkpoint, output_dir, quantize=True, opset=17):
+    # Writes model.onnx (and model_quantized.onnx) plus tokenizer and config to output_dir
+    torch, transformers = _require("torch", "transformers")
+    tokenizer = transformers.AutoTokenizer.from_pretrained(checkpoint, local_files_only=True)
+    model = transformers.AutoModelForSequenceClassification.from_pretrained(checkpoint, local_files_only=True)
+    model.eval()
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+
+    sample = tokenizer(["export sample", "a slightly longer export sample"], padding=True, return_tensors="pt")
+    input_names = [n for n in tokenizer.model_input_names if n in MODEL_INPUTS and n in sample]
+    onnx_path = os.path.join(output_dir, ONNX_FILES[1])
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[n] for n in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=["logits"],
+            # Batch size and sequence length vary per length bucket
+            dynamic_axes={**{n: {0: "batch", 1: "sequence"} for n in input_names}, "logits": {0: "batch"}},
+            opset_version=opset,
+        )
+
+    if not quantize:
+        return onnx_path
+    _require("onnxruntime")
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = os.path.join(output_dir, ONNX_FILES[0])
+    quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+def add_transformer_arguments(parser, prefix="transformer-"):
+    parser.add_argument(f"--{prefix}max-length", dest="max_length", type=int, default=256,
+                        help="Truncate articles to this many tokens")
+    parser.add_argument(f"--{prefix}max-batch-tokens", dest="max_batch_tokens", type=int, default=8192,
+                        help="Padded tokens per length-bucketed batch")
+    parser.add_argument(f"--{prefix}max-batch-size", dest="max_batch_size", type=int, default=64)
+    parser.add_argument(f"--{prefix}threads", dest="threads", type=int, default=None, help="CPU threads")
+
+
+def _benchmark(args):
+    from distill import load_corpus
+
+    texts, _ = load_corpus(args.corpus)
+    texts = texts[:args.limit]
+    classifier = TransformerClassifier(
+        args.checkpoint,
+        max_length=args.max_length,
+        max_batch_tokens=args.max_batch_tokens,
+        max_batch_size=args.max_batch_size,
+        num_threads=args.threads,
+        use_onnx={"auto": None, "onnx": True, "torch": False}[args.runtime],
+        quantize=args.quantize,
+    )
+    start_time = time.perf_counter()
+    classifier.score(texts)
+    elapsed = time.perf_counter() - start_time
+    print(f"{classifier.runtime}: {len(texts)} articles in {elapsed:.2f}s "
+          f"({len(texts) / max(elapsed, 1e-9):.1f} articles/s, {elapsed * 1000 / max(len(texts), 1):.2f} ms/article)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU transformer backend: ONNX export and benchmarking.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Export a checkpoint to ONNX, int8-quantized by default")
+    export.add_argument("checkpoint", help="Local transformer checkpoint directory")
+    export.add_argument("output_dir")
+    export.add_argument("--no-quantize", action="store_true", help="Only write the float model.onnx")
+    export.add_argument("--opset", type=int, default=17)
+
+    bench = commands.add_parser("bench", help="Time scoring of a CSV/Parquet corpus")
+    bench.add_argument("checkpoint", help="Checkpoint or exported ONNX directory")
+    bench.add_argument("corpus")
+    bench.add_argument("--limit", type=int, default=1000)
+    bench.add_argument("--runtime", choices=("auto", "onnx", "torch"), default="auto")
+    bench.add_argument("--quantize", action="store_true", help="torch runtime: dynamic int8 Linear layers")
+    add_transformer_arguments(bench, prefix="")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        path = export_onnx(args.checkpoint, args.output_dir, quantize=not args.no_quantize, opset=args.opset)
+        print(f"Wrote {path}", file=sys.stderr)
+    else:
+        _benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+try:
+    from flet_core.protocol import CommandEncoder
+except ImportError:  # newer Flet releases merged flet_core into flet
+    from flet.core.protocol import CommandEncoder
+
+# Batched, diffed UI updates for Flet.
+#
+# Handlers call updater.set(control, prop=value, ...) instead of assigning properties
+# and calling page.update() themselves. Only values that actually change are assigned,
+# only the controls that changed are remembered, and flush() sends them in a single
+# page.update(*controls) so one interaction is one round trip.
+#
+# With NEWS_UI_MEASURE=1 each flush reports the number of controls and properties sent,
+# the payload size (the JSON of the commands Flet sends, including every child control
+# an update adds) and the round-trip time of the update call.
+
+ROUND_TRIP_SAMPLES = 1000  # Recent round trips kept for the median; totals cover the whole session
+
+_measuring = threading.local()
+
+
+def _measure_connection(connection):
+    # Wraps connection.send_commands once so flushes on this thread can count the bytes sent.
+    # page.update() sends synchronously on the calling thread, and the connection may be
+    # shared by several sessions, so the count is thread-local.
+    if connection is None or getattr(connection, "_ui_measured", False):
+        return
+    send_commands = connection.send_commands
+
+    def measured_send_commands(session_id, commands):
+        if getattr(_measuring, "active", False):
+            _measuring.bytes += len(json.dumps(commands, cls=CommandEncoder, separators=(",", ":")).encode("utf-8"))
+        return send_commands(session_id, commands)
+
+    connection.send_commands = measured_send_commands
+    connection._ui_measured = True
+
+
+class UiUpdater:
+    def __init__(self, page, measure=None):
+        self.page = page
+        self.measure = os.environ.get("NEWS_UI_MEASURE") == "1" if measure is None else measure
+        self._dirty = {}  # id(control) -> control, in first-change order
+        self._props = 0  # properties changed since the last flush
+        self._page_dirty = False
+        # Handlers and the live-analysis timer run on different threads
+        self._lock = threading.RLock()
+
+        self.flushes = 0
+        self.total_bytes = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.round_trips = deque(maxlen=ROUND_TRIP_SAMPLES)
+
+    def set(self, control, **props):
+        # Assign only the properties whose value differs; returns True if anything changed
+        changed = False
+        with self._lock:
+            for name, value in props.items():
+                if getattr(control, name) != value:
+                    setattr(control, name, value)
+                    changed = True
+                    self._props += 1
+            if changed:
+                self._dirty.setdefault(id(control), control)
+        return changed
+
+    def mark_page(self):
+        # For page-level properties (e.g. page.snack_bar) that need a full page.update()
+        with self._lock:
+            self._page_dirty = True
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._dirty and not self._page_dirty:
+            return
+
+        controls = list(self._dirty.values())
+        if self.measure:
+            _measure_connection(self.page.connection)
+            _measuring.active, _measuring.bytes = True, 0
+        start_time = time.perf_counter()
+        try:
+            if self._page_dirty:
+                self.page.update()
+            else:
+                self.page.update(*controls)
+        finally:
+            _measuring.active = False
+        elapsed = time.perf_counter() - start_time
+
+        if self.measure:
+            payload = _measuring.bytes
+            self.flushes += 1
+            self.total_bytes += payload
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            self.round_trips.append(elapsed)
+            print(
+                f"[ui] update #{self.flushes}: {len(controls)} controls, {self._props} props, {payload} B"
+                f"{' + page' if self._page_dirty else ''}, {elapsed * 1000:.1f} ms",
+                file=sys.stderr,
+            )
+
+        self._dirty.clear()
+        self._props = 0
+        self._page_dirty = False
+
+    def summary(self):
+        if not self.flushes:
+            return "no updates measured"
+        recent = sorted(self.round_trips)
+        return (
+            f"{self.flushes} updates, {self.total_bytes} B total, "
+            f"mean {self.total_seconds / self.flushes * 1000:.1f} ms, "
+            f"p50 (last {len(recent)}) {recent[len(recent) // 2] * 1000:.1f} ms, max {self.max_seconds * 1000:.1f} ms"
+        )